@@ -1,27 +1,91 @@
+import asyncio
+import hmac
+import json
 import logging
 import os
+import queue
 import sys
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.requests import HTTPConnection
 
-from src.chat_engine import get_engine
-from src.config import LOG_LEVEL, LOG_FORMAT
+from src.admission import AdmissionRejected, get_admission_controller
+from src.chat_engine import (
+    ChatEngine,
+    get_coalescing_stats,
+    get_engine,
+    get_routing_stats,
+    get_semantic_cache_stats,
+    get_session_engine,
+    get_session_stats,
+    register_connection_engine,
+    release_session_engine,
+    unregister_connection_engine,
+)
+from src.config import (
+    ADMIN_TOKEN,
+    BATCH_MAX_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    DRAIN_TIMEOUT_SECONDS,
+    MEMORY_TRACE_ON_START,
+    PROFILE_INTERVAL_MS,
+    PROFILE_MAX_SECONDS,
+    RATE_LIMIT_TRUSTED_PROXIES,
+    REQUEST_DEADLINE_SECONDS,
+    SESSION_PERSISTENCE,
+    WARM_UP_ON_STARTUP,
+)
+from src.lifecycle import Draining, get_drain_controller, serve
+from src.logging_utils import configure_logging, logging_stats, stop_logging
+from src.memory_report import get_memory_reporter, start_tracing
+from src.model_provider import get_provider
 from src.moderation import get_moderator
+from src.profiling import ProfilerBusy, StackSampler, profile_process
+from src.rate_limit import RateLimited, get_rate_limiter, retry_after_header
+from src.resilience import Deadline
+from src.session_store import get_session_store, is_valid_session_id
+from src.warmup import get_keep_warm, get_startup_report, start_background_warm_up
 
 # ---------- App and Logging Setup ----------
-# Configure logging
-logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+# Configure logging (queued, written by a background thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Open /ws/chat connections, each owning one conversation
+_active_websockets = 0
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start loading models in the background so the worker accepts connections immediately."""
+    if MEMORY_TRACE_ON_START:
+        start_tracing()
+    if WARM_UP_ON_STARTUP:
+        start_background_warm_up()
+        get_keep_warm().start()
+    yield
+    # Let in-flight generations finish, then flush pending writes
+    await asyncio.to_thread(get_drain_controller().drain, DRAIN_TIMEOUT_SECONDS)
+    get_keep_warm().stop()
+    if SESSION_PERSISTENCE:
+        get_session_store().close(timeout=10)
+    stop_logging()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="CS3249 Assignment 1 Backend",
     description="Backend API for the Conversational User Interface",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 
@@ -30,34 +94,416 @@ class ChatRequest(BaseModel):
     """Request model for the /chat endpoint."""
 
     message: str
+    session_id: Optional[str] = None
+    # turn_count of the last response the client received for session_id;
+    # lets a worker notice turns another worker recorded since
+    turn_count: Optional[int] = None
+
+
+class BatchItem(BaseModel):
+    """A single independent prompt in a batch request."""
+
+    id: str
+    prompt: str
+
+
+class BatchRequest(BaseModel):
+    """Request model for the /chat/batch endpoint."""
+
+    items: List[BatchItem]
+    max_concurrency: Optional[int] = None
+
+
+# ---------- Helpers ----------
+def require_admin(token: Optional[str]):
+    """
+    Reject the request unless it carries the admin token.
+
+    Admin features are reported as not found when no token is configured.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def client_address(connection: HTTPConnection) -> Optional[str]:
+    """
+    Address a request is rate limited by.
+
+    X-Forwarded-For is only read when the peer is one of
+    RATE_LIMIT_TRUSTED_PROXIES, and is walked from the right, so a client
+    cannot choose its key by sending the header itself.
+    """
+    address = connection.client.host if connection.client else None
+    if address not in RATE_LIMIT_TRUSTED_PROXIES:
+        return address
+    forwarded = connection.headers.get("x-forwarded-for", "")
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        address = hop
+        if hop not in RATE_LIMIT_TRUSTED_PROXIES:
+            break
+    return address
+
+
+def rate_limited_response(e: RateLimited) -> JSONResponse:
+    """HTTP 429 for a rate-limited request."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(e), "retry_after": round(e.retry_after, 3), "scope": e.scope},
+        headers={"Retry-After": retry_after_header(e.retry_after)},
+    )
+
+
+def draining_response(e: Draining) -> JSONResponse:
+    """HTTP 503 for work arriving while the server drains."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(e), "retry_after": e.retry_after},
+        headers={"Retry-After": retry_after_header(e.retry_after)},
+    )
 
 
 # ---------- API Endpoints ----------
 @app.post("/chat")
-async def handle_chat(request: ChatRequest):
+def handle_chat(
+    request: ChatRequest,
+    http_request: Request,
+    x_request_timeout: Optional[float] = Header(default=None),
+    x_profile: Optional[str] = Header(default=None),
+    x_admin_token: Optional[str] = Header(default=None),
+):
     """
     Handle a single chat message from the user.
+
+    Declared synchronous so FastAPI runs it in its threadpool and concurrent
+    chats do not block the event loop while waiting on the model.
+
+    The optional X-Request-Timeout header (seconds) lets a client shorten the
+    end-to-end deadline below REQUEST_DEADLINE_SECONDS.
+
+    Requests carrying a session_id (from POST /session) continue that
+    conversation, including after a backend restart; requests without one
+    share the default conversation.
+
+    Requests are rate limited per client address and per session_id
+    (HTTP 429 with Retry-After).
+
+    With X-Profile: 1 (and X-Admin-Token), the handling thread is sampled
+    while the message is processed and the response gains a "profile" field
+    with the collapsed stacks.
     """
+    if x_profile:
+        require_admin(x_admin_token)
     try:
-        engine = get_engine()
-        result = engine.process_message(request.message)
+        get_rate_limiter().check(client_address(http_request), request.session_id)
+    except RateLimited as e:
+        return rate_limited_response(e)
+    budget = REQUEST_DEADLINE_SECONDS
+    if x_request_timeout is not None and x_request_timeout > 0:
+        budget = min(budget, x_request_timeout)
+    try:
+        engine = (
+            get_session_engine(request.session_id, request.turn_count)
+            if request.session_id else get_engine()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        with get_drain_controller().track():
+            if x_profile:
+                with StackSampler(thread_ids=[threading.get_ident()]) as sampler:
+                    result = engine.process_message(request.message, deadline=Deadline(budget))
+                result["profile"] = {**sampler.summary(), "collapsed": sampler.collapsed()}
+            else:
+                result = engine.process_message(request.message, deadline=Deadline(budget))
+        logger.info(
+            "Chat request completed in %d ms", result["latency_ms"],
+            extra={
+                "session_id": result["session_id"],
+                "turn": result["turn_count"],
+                "safety_action": result["safety_action"],
+                "latency_ms": result["latency_ms"],
+            },
+        )
         return result
+    except Draining as e:
+        return draining_response(e)
+    except AdmissionRejected as e:
+        logger.warning("Rejected chat request: %s", e)
+        return JSONResponse(
+            status_code=429,
+            content={"detail": str(e), "retry_after": e.retry_after},
+            headers={"Retry-After": retry_after_header(e.retry_after)},
+        )
     except Exception as e:
-        logger.error(f"Error processing chat request: {e}", exc_info=True)
+        logger.error("Error processing chat request: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@app.post("/chat/batch")
+def handle_chat_batch(request: BatchRequest, http_request: Request):
+    """
+    Process many independent single-turn prompts.
+
+    Streams one NDJSON line per item, in completion order, with the same
+    fields as the records written by scripts/evaluate.py. Each batch counts
+    as one request against the client's rate limit.
+    """
+    try:
+        get_rate_limiter().check(client_address(http_request))
+    except RateLimited as e:
+        return rate_limited_response(e)
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.items)} items (max {BATCH_MAX_ITEMS})",
+        )
+    max_concurrency = min(request.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    items = [item.model_dump() for item in request.items]
+    engine = get_engine()
+    drain = get_drain_controller()
+    if drain.draining:
+        return draining_response(Draining())
+
+    def stream():
+        # Registered once streaming starts, so a response that is never
+        # streamed cannot hold up the drain
+        with drain.track():
+            for record in engine.process_batch(items, max_concurrency=max(1, max_concurrency)):
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    logger.info("Processing batch of %d items", len(items))
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/chat/stream")
+def handle_chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    x_request_timeout: Optional[float] = Header(default=None),
+):
+    """
+    Handle a chat message, streaming the model output as it is generated.
+
+    Takes the same body as /chat and returns NDJSON lines:
+        {"type": "token", "content": ...}   streamed model output
+        {"type": "response", ...}           final /chat payload; authoritative,
+                                            since output moderation may replace
+                                            the streamed text
+        {"type": "error", "status": ..., "detail": ...}
+    """
+    try:
+        get_rate_limiter().check(client_address(http_request), request.session_id)
+    except RateLimited as e:
+        return rate_limited_response(e)
+    budget = REQUEST_DEADLINE_SECONDS
+    if x_request_timeout is not None and x_request_timeout > 0:
+        budget = min(budget, x_request_timeout)
+    try:
+        engine = (
+            get_session_engine(request.session_id, request.turn_count)
+            if request.session_id else get_engine()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    drain = get_drain_controller()
+    try:
+        drain.begin()
+    except Draining as e:
+        return draining_response(e)
+
+    events: queue.SimpleQueue = queue.SimpleQueue()
+
+    def run():
+        try:
+            result = engine.process_message(
+                request.message,
+                deadline=Deadline(budget),
+                on_token=lambda fragment: events.put({"type": "token", "content": fragment}),
+            )
+            events.put({"type": "response", **result})
+        except AdmissionRejected as e:
+            logger.warning("Rejected streaming chat request: %s", e)
+            events.put({"type": "error", "status": 429, "detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error("Error processing streaming chat request: %s", e, exc_info=True)
+            events.put({"type": "error", "status": 500, "detail": "Internal Server Error"})
+        finally:
+            drain.end()
+            events.put(None)
+
+    def stream():
+        while (event := events.get()) is not None:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    threading.Thread(target=run, name="chat-stream", daemon=True).start()
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def parse_ws_frame(raw) -> Optional[dict]:
+    """Decode a WebSocket frame holding a JSON object; None if it is anything else."""
+    if raw is None:
+        return None
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, session_id: Optional[str] = None):
+    """
+    Chat over a WebSocket; the connection owns one conversation.
+
+    Pass ?session_id=... to resume a persisted conversation.
+
+    Client messages:
+        {"message": "..."}   send a chat message
+        {"type": "reset"}    start a new conversation on the same socket
+
+    Server messages:
+        {"type": "session", "session_id": ...}  on connect and after reset
+        {"type": "token", "content": ...}       streamed model output
+        {"type": "response", ...}               final /chat payload; authoritative,
+                                                since output moderation may replace
+                                                the streamed text
+        {"type": "error", "status": ..., "detail": ...}
+
+    The in-memory conversation state is dropped when the socket closes.
+    """
+    global _active_websockets
+    if session_id is not None and not is_valid_session_id(session_id):
+        await websocket.close(code=1008, reason="Invalid session id")
+        return
+    drain = get_drain_controller()
+    if drain.draining:
+        await websocket.close(code=1012, reason="Server restarting")
+        return
+    engine = ChatEngine(session_id=session_id)
+    await websocket.accept()
+    _active_websockets += 1
+    register_connection_engine(engine)
+    loop = asyncio.get_running_loop()
+    try:
+        await websocket.send_json({"type": "session", "session_id": engine.session_id})
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000), frame.get("reason"))
+            data = parse_ws_frame(frame.get("text") or frame.get("bytes"))
+            if data is None:
+                await websocket.send_json(
+                    {"type": "error", "status": 400, "detail": "Expected a JSON object"}
+                )
+                continue
+            if data.get("type") == "reset":
+                engine.reset()
+                await websocket.send_json({"type": "session", "session_id": engine.session_id})
+                continue
+            message = data.get("message")
+            if not isinstance(message, str) or not message:
+                await websocket.send_json(
+                    {"type": "error", "status": 400, "detail": "Expected a non-empty 'message'"}
+                )
+                continue
+            try:
+                get_rate_limiter().check(client_address(websocket), engine.session_id)
+            except RateLimited as e:
+                await websocket.send_json(
+                    {"type": "error", "status": 429, "detail": str(e), "retry_after": e.retry_after}
+                )
+                continue
+            try:
+                drain.begin()
+            except Draining as e:
+                # Ask the client to reconnect, reaching another instance
+                await websocket.send_json(
+                    {"type": "error", "status": 503, "detail": str(e), "retry_after": e.retry_after}
+                )
+                await websocket.close(code=1012, reason="Server restarting")
+                return
+
+            tokens: asyncio.Queue = asyncio.Queue()
+
+            def on_token(fragment: str):
+                loop.call_soon_threadsafe(tokens.put_nowait, fragment)
+
+            def run():
+                try:
+                    return engine.process_message(
+                        message, deadline=Deadline(REQUEST_DEADLINE_SECONDS), on_token=on_token
+                    )
+                finally:
+                    drain.end()
+                    loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+            task = loop.run_in_executor(None, run)
+            while (fragment := await tokens.get()) is not None:
+                await websocket.send_json({"type": "token", "content": fragment})
+            try:
+                result = await task
+            except AdmissionRejected as e:
+                logger.warning("Rejected websocket chat message: %s", e)
+                await websocket.send_json(
+                    {"type": "error", "status": 429, "detail": str(e), "retry_after": e.retry_after}
+                )
+                continue
+            except Exception as e:
+                logger.error("Error processing websocket chat message: %s", e, exc_info=True)
+                await websocket.send_json(
+                    {"type": "error", "status": 500, "detail": "Internal Server Error"}
+                )
+                continue
+            await websocket.send_json({"type": "response", **result})
+    except WebSocketDisconnect:
+        logger.info("WebSocket closed for session %s", engine.session_id)
+    finally:
+        _active_websockets -= 1
+        unregister_connection_engine(engine)
+        engine.conversation_history.clear()
+
+
+@app.post("/session")
+def create_session(http_request: Request):
+    """
+    Start a new persisted conversation and return its session_id.
+
+    Counts against the client's rate limit, so fresh sessions cannot be used
+    to sidestep the per-session limit.
+    """
+    if get_drain_controller().draining:
+        return draining_response(Draining())
+    try:
+        get_rate_limiter().check(client_address(http_request))
+    except RateLimited as e:
+        return rate_limited_response(e)
+    return {"session_id": get_session_engine().session_id}
+
+
 @app.post("/reset")
-async def reset_engine():
+def reset_engine(http_request: Request, session_id: Optional[str] = None):
     """
     Reset the chat engine.
+
+    With a session_id query parameter, that session is released and a new
+    session_id is returned; the old session's turns stay in the store.
+    Counts against the client's rate limit like POST /session.
     """
     try:
+        get_rate_limiter().check(client_address(http_request))
+    except RateLimited as e:
+        return rate_limited_response(e)
+    try:
+        if session_id:
+            release_session_engine(session_id)
+            return {"message": "Session reset", "session_id": get_session_engine().session_id}
         engine = get_engine()
         engine.reset()
         return {"message": "Engine reset"}
     except Exception as e:
-        logger.error(f"Error resetting engine: {e}", exc_info=True)
+        logger.error("Error resetting engine: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
@@ -74,9 +520,140 @@ async def get_disclaimer():
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@app.get("/healthz")
+async def liveness():
+    """
+    Liveness probe: the process is up and serving requests.
+    """
+    return {"status": "ok", "moderator_loaded": get_moderator().is_loaded}
+
+
+@app.get("/readyz")
+def readiness():
+    """
+    Readiness probe: not draining, warm-up finished, moderator loaded and
+    Ollama reachable.
+
+    Also reports whether the target model is resident in Ollama memory;
+    a non-resident model does not fail readiness since the next request
+    (or keep-warm ping) reloads it.
+    """
+    provider = get_provider()
+    report = get_startup_report().to_dict()
+    drain = get_drain_controller().status()
+    checks = {
+        "not_draining": not drain["draining"],
+        "warm_up_finished": report["finished"],
+        "moderator_loaded": get_moderator().is_loaded,
+        "ollama_reachable": provider.health_check(),
+    }
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "checks": checks,
+            "model": provider.model_name,
+            "model_resident": checks["ollama_reachable"] and provider.is_model_resident(),
+            "endpoints": provider.endpoint_stats(),
+            "keep_warm": get_keep_warm().to_dict(),
+            "drain": drain,
+            "startup": report,
+        },
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Report runtime state of the model path for monitoring.
+    """
+    provider = get_provider()
+    return {
+        "circuit_breaker": provider.circuit_stats(),
+        "endpoints": provider.endpoint_stats(),
+        "coalescing": get_coalescing_stats(),
+        "routing": get_routing_stats(),
+        "semantic_cache": get_semantic_cache_stats(),
+        "admission": get_admission_controller().stats(),
+        "rate_limit": get_rate_limiter().stats(),
+        "drain": get_drain_controller().status(),
+        "websockets": _active_websockets,
+        "sessions": get_session_stats(),
+        "logging": logging_stats(),
+    }
+
+
+@app.get("/admin/profile")
+def admin_profile(
+    seconds: float = 10,
+    interval_ms: float = PROFILE_INTERVAL_MS,
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    """
+    Sample the stacks of all threads for a number of seconds.
+
+    Returns collapsed stacks ("frame;frame count" per line), ready for
+    flamegraph.pl or speedscope. Only one profile runs at a time.
+    """
+    require_admin(x_admin_token)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]"
+        )
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+    try:
+        sampler = profile_process(seconds, interval_ms)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info("Captured %d profile samples over %.1fs", sampler.samples, seconds)
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{os.getpid()}.collapsed"',
+            "X-Profile-Samples": str(sampler.samples),
+        },
+    )
+
+
+@app.post("/admin/drain")
+def admin_drain(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Start draining without stopping the process (e.g. from a pre-stop hook).
+
+    Readiness fails and new chat work gets HTTP 503 from now on; poll the
+    returned in_flight count (also in /readyz) until it reaches zero.
+    """
+    require_admin(x_admin_token)
+    drain = get_drain_controller()
+    drain.start_drain()
+    return drain.status()
+
+
+@app.get("/admin/memory")
+def admin_memory(
+    top: int = 20,
+    diff: bool = True,
+    reset: bool = False,
+    x_admin_token: Optional[str] = Header(default=None),
+):
+    """
+    Report where this worker's memory is going.
+
+    Lists process RSS, the modules holding the most traced Python memory,
+    live sessions and history sizes, cache sizes and moderation model tensor
+    memory. With diff, also lists per-module growth since the previous call;
+    reset starts a new baseline.
+    """
+    require_admin(x_admin_token)
+    reporter = get_memory_reporter()
+    if reset:
+        reporter.reset()
+    return reporter.report(top=max(1, top), diff=diff)
+
+
 # ---------- Main Entry Point ----------
 if __name__ == "__main__":
-    import uvicorn
-
     logger.info("Starting backend server...")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    serve(app, host="0.0.0.0", port=8000)
@@ -1,6 +1,8 @@
+import json
 import os
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
 # ---------- Page setup ----------
 st.set_page_config(page_title="PsychPal", page_icon="💬", layout="centered")
@@ -9,16 +11,74 @@ st.title("Talk to PsychPal!")
 # ---------- Backend URL ----------
 BACKEND_URL = os.getenv("CS3249_BACKEND_URL", "http://localhost:8000")
 
+# Messages rendered per page of history; older ones load on demand
+HISTORY_PAGE_SIZE = 20
+
+# Separator the backend puts between the disclaimer and the first reply
+DISCLAIMER_SEPARATOR = "\n\n---\n\n"
+
+
+# ---------- HTTP session ----------
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """One pooled keep-alive session shared by all reruns and browser tabs."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+http = get_http_session()
+
+
+def client_headers() -> dict:
+    """
+    Headers identifying this browser to the backend's per-client rate limit.
+
+    The backend trusts X-Forwarded-For only from RATE_LIMIT_TRUSTED_PROXIES;
+    without it every browser would share the frontend server's bucket.
+    """
+    address = getattr(getattr(st, "context", None), "ip_address", None)
+    return {"X-Forwarded-For": address} if address else {}
+
+
+def new_backend_session():
+    """Start a backend conversation for this browser session (None if unavailable)."""
+    try:
+        resp = http.post(f"{BACKEND_URL}/session", headers=client_headers(), timeout=5)
+        resp.raise_for_status()
+        return resp.json().get("session_id")
+    except Exception as e:
+        st.error(f"Failed to start a session: {e}")
+        return None
+
+
+def reset_conversation():
+    """Clear local history and start a new backend conversation."""
+    st.session_state.history = []
+    st.session_state.blocked = False
+    st.session_state.visible = HISTORY_PAGE_SIZE
+    st.session_state.disclaimer_pending = True
+    st.session_state.turn_count = None
+    try:
+        resp = http.post(
+            f"{BACKEND_URL}/reset",
+            params={"session_id": st.session_state.get("session_id")},
+            headers=client_headers(),
+            timeout=5,
+        )
+        resp.raise_for_status()
+        st.session_state.session_id = resp.json().get("session_id")
+    except Exception as e:
+        st.error(f"Failed to reset backend: {e}")
+
+
 # ---------- Sidebar ----------
 with st.sidebar:
     st.title("PsychPal Toolbar")
     if st.button("Clear Conversation", use_container_width=True, type="primary"):
-        st.session_state.history = []
-        st.session_state.blocked = False
-        try:
-            requests.post(f"{BACKEND_URL}/reset", timeout=5)
-        except Exception as e:
-            st.error(f"Failed to reset backend: {e}")
+        reset_conversation()
 
     st.title("Helpful Resources")
 
@@ -52,7 +112,7 @@ with st.sidebar:
 @st.cache_data(ttl=3600)  # Cache for 1 hour
 def get_disclaimer():
     try:
-        resp = requests.get(f"{BACKEND_URL}/disclaimer", timeout=5)
+        resp = http.get(f"{BACKEND_URL}/disclaimer", timeout=5)
         resp.raise_for_status()
         return resp.json().get("disclaimer", "")
     except Exception as e:
@@ -65,29 +125,104 @@ disclaimer_text = get_disclaimer()
 # ---------- Initialize history ----------
 if "history" not in st.session_state:
     st.session_state.history = []
+    st.session_state.visible = HISTORY_PAGE_SIZE
+    # Only the first reply of a backend session carries the disclaimer
+    st.session_state.disclaimer_pending = True
     if disclaimer_text:
         st.session_state.history.append(
             {"role": "assistant", "content": disclaimer_text}
         )
+if not st.session_state.get("session_id"):
+    st.session_state.session_id = new_backend_session()
+if "streaming" not in st.session_state:
+    st.session_state.streaming = True  # switched off if the backend has no /chat/stream
 
 # ---------- Render history ----------
-for turn in st.session_state.history:
+# Only the most recent page is rendered, so reruns stay cheap as the
+# conversation grows
+history = st.session_state.history
+hidden = max(0, len(history) - st.session_state.visible)
+if hidden:
+    if st.button(f"Show earlier messages ({hidden})", use_container_width=True):
+        st.session_state.visible += HISTORY_PAGE_SIZE
+        st.rerun()
+for turn in history[hidden:]:
     with st.chat_message(turn["role"]):
         st.write(turn["content"])
 
 
 # ---------- Message sender ----------
+def error_reply(text: str) -> dict:
+    """Reply shown when the backend gave no response; the turn was not recorded."""
+    return {"response": text, "safety_action": "allow", "error": True}
+
+
+def strip_disclaimer(reply_data: dict) -> str:
+    """
+    Return the reply text without the disclaimer the backend prepends to the
+    first reply of a session.
+
+    Only a backend response consumes the pending disclaimer; after an error
+    the backend still sends it with the next reply.
+    """
+    reply = reply_data.get("response") or ""
+    if reply_data.get("error") or not st.session_state.disclaimer_pending:
+        return reply
+    st.session_state.disclaimer_pending = False
+    if disclaimer_text and reply.startswith(disclaimer_text):
+        return reply[len(disclaimer_text):].removeprefix(DISCLAIMER_SEPARATOR).strip()
+    return reply
+
+
 def send_to_backend(user_text: str) -> dict:
     """POST to backend and return assistant text (or error)."""
     payload = {
         "message": user_text,
+        "session_id": st.session_state.session_id,
+        "turn_count": st.session_state.get("turn_count"),
     }
     try:
-        resp = requests.post(f"{BACKEND_URL}/chat", json=payload, timeout=60)
+        resp = http.post(f"{BACKEND_URL}/chat", json=payload, headers=client_headers(), timeout=60)
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
-        return {"response": f"[Frontend error: {e}]", "safety_action": "allow"}
+        return error_reply(f"[Frontend error: {e}]")
+
+
+def stream_from_backend(user_text: str, placeholder) -> dict:
+    """
+    POST to the streaming endpoint, showing tokens in placeholder as they arrive.
+
+    Falls back to /chat if the backend does not offer streaming.
+    """
+    payload = {
+        "message": user_text,
+        "session_id": st.session_state.session_id,
+        "turn_count": st.session_state.get("turn_count"),
+    }
+    try:
+        with http.post(
+            f"{BACKEND_URL}/chat/stream", json=payload, headers=client_headers(), timeout=60, stream=True
+        ) as resp:
+            if resp.status_code == 404:
+                st.session_state.streaming = False
+                return send_to_backend(user_text)
+            resp.raise_for_status()
+            text = ""
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event["type"] == "token":
+                    text += event["content"]
+                    placeholder.markdown(text + "▌")
+                elif event["type"] == "response":
+                    return event
+                elif event["type"] == "error":
+                    return error_reply(f"[Backend error: {event['detail']}]")
+        return error_reply("[Frontend error: stream ended without a response]")
+    except Exception as e:
+        return error_reply(f"[Frontend error: {e}]")
 
 
 # ---------- Chat input ----------
@@ -111,19 +246,21 @@ if user_input:
     with st.chat_message("user"):
         st.write(user_input)
 
-    # get assistant reply
-    reply_data = send_to_backend(user_input)
-    reply = reply_data.get("response") or ""
-
-    # Strip disclaimer if present
-    if disclaimer_text and reply.startswith(disclaimer_text):
-        reply = reply[len(disclaimer_text) :].strip()
-        if reply.startswith("---\n"):
-            reply = reply[len("---\n") :].strip()
+    # get assistant reply, streamed when the backend supports it
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        if st.session_state.streaming:
+            reply_data = stream_from_backend(user_input, placeholder)
+        else:
+            reply_data = send_to_backend(user_input)
+        # The final response is authoritative: moderation may have replaced
+        # the streamed text
+        reply = strip_disclaimer(reply_data)
+        placeholder.markdown(reply)
+    if "turn_count" in reply_data:
+        st.session_state.turn_count = reply_data["turn_count"]
 
     st.session_state.history.append({"role": "assistant", "content": reply})
-    with st.chat_message("assistant"):
-        st.write(reply)
 
     if reply_data.get("safety_action") == "block":
         st.session_state.blocked = True
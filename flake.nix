@@ -24,7 +24,6 @@
 
           transformers
           torch
-          tensorflow
         ]);
       commonPackages = with pkgs; [
         # libGL glibc glib 
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Memory and speed benchmark for conversation history.
+
+Compares the former list-of-dicts history (re-sliced on every turn once over
+the window) with ConversationHistory, holding many idle sessions whose
+history is full. Message texts are shared between sessions so the numbers
+show the per-session container overhead rather than the text itself.
+
+Usage:
+    python scripts/benchmark_history.py
+    python scripts/benchmark_history.py --sessions 10000 100000 --turns 500
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import CONTEXT_WINDOW_SIZE
+from src.history import ConversationHistory, Role
+
+MAX_HISTORY = CONTEXT_WINDOW_SIZE * 2
+USER_TEXT = "I have been feeling stressed about my exams lately."
+ASSISTANT_TEXT = "That sounds difficult. What part of the exams worries you most?"
+
+
+def dict_session(turns: int) -> List[dict]:
+    """Build a history the way ChatEngine used to."""
+    history = []
+    for _ in range(turns):
+        history.append({"role": "user", "content": USER_TEXT})
+        history.append({"role": "assistant", "content": ASSISTANT_TEXT})
+        if len(history) > MAX_HISTORY:
+            history = history[-MAX_HISTORY:]
+    return history
+
+
+def compact_session(turns: int) -> ConversationHistory:
+    """Build a history with ConversationHistory."""
+    history = ConversationHistory(MAX_HISTORY)
+    for _ in range(turns):
+        history.append(Role.USER, USER_TEXT)
+        history.append(Role.ASSISTANT, ASSISTANT_TEXT)
+    return history
+
+
+def measure_memory(build: Callable, sessions: int) -> float:
+    """Return bytes allocated per session for `sessions` full histories."""
+    gc.collect()
+    tracemalloc.start()
+    held = [build(CONTEXT_WINDOW_SIZE) for _ in range(sessions)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current / sessions
+
+
+def measure_turns(build: Callable, turns: int) -> float:
+    """Return microseconds per turn appended to one long-running session."""
+    start = time.perf_counter()
+    build(turns)
+    return (time.perf_counter() - start) / turns * 1e6
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark conversation history memory")
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        nargs="+",
+        default=[10000, 100000],
+        help="Idle session counts to measure"
+    )
+    parser.add_argument(
+        "--turns",
+        type=int,
+        default=100000,
+        help="Turns appended to one session for the speed measurement"
+    )
+    args = parser.parse_args()
+
+    print(f"History window: {MAX_HISTORY} messages per session")
+    for sessions in args.sessions:
+        before = measure_memory(dict_session, sessions)
+        after = measure_memory(compact_session, sessions)
+        print(
+            f"{sessions:>7} sessions: dicts {before * sessions / 2**20:8.1f} MiB "
+            f"({before:.0f} B/session) | compact {after * sessions / 2**20:8.1f} MiB "
+            f"({after:.0f} B/session) | {1 - after / before:.0%} less"
+        )
+
+    before = measure_turns(dict_session, args.turns)
+    after = measure_turns(compact_session, args.turns)
+    print(f"Append with eviction: dicts {before:.2f} us/turn | compact {after:.2f} us/turn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark of logging overhead per request.
+
+Emits the records a typical /chat request produces (a completion record
+with structured fields, a moderation hit and a disabled debug record) and
+measures the time spent on the request thread under each logging setup.
+Records are written to a file, as a deployed backend would.
+
+Usage:
+    python scripts/benchmark_logging.py
+    python scripts/benchmark_logging.py --requests 50000 --threads 8
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import LOG_FORMAT
+from src.logging_utils import configure_logging, logging_stats, stop_logging
+
+moderation_logger = logging.getLogger("src.moderation")
+request_logger = logging.getLogger("app.backend")
+provider_logger = logging.getLogger("src.model_provider")
+
+REQUEST_DATA = {"model": "phi3:mini", "prompt": "x" * 4000, "options": {"temperature": 0.0}}
+
+
+def eager_request(i: int):
+    """Log calls as they were: f-strings and an unguarded debug dump."""
+    provider_logger.debug(f"Sending request to model: {json.dumps(REQUEST_DATA, indent=2)}")
+    moderation_logger.warning(f"Content detected: Medical request detected (confidence {0.91:.2f})")
+    request_logger.info(f"Chat request completed in {120 + i % 50} ms for session_{i:032x}")
+
+
+def lazy_request(i: int):
+    """Log calls as they are now: deferred formatting and structured fields."""
+    if provider_logger.isEnabledFor(logging.DEBUG):
+        provider_logger.debug("Sending request to model: %s", json.dumps(REQUEST_DATA, indent=2))
+    moderation_logger.warning(
+        "Content detected: %s", "Medical request detected",
+        extra={"tags": ["medical"], "confidence": 0.91},
+    )
+    request_logger.info(
+        "Chat request completed in %d ms", 120 + i % 50,
+        extra={"session_id": f"session_{i:032x}", "latency_ms": 120 + i % 50},
+    )
+
+
+def run(emit, requests: int, threads: int) -> float:
+    """Return request-thread microseconds per request."""
+    per_thread = requests // threads
+
+    def worker(offset: int):
+        for i in range(offset, offset + per_thread):
+            emit(i)
+
+    workers = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e6
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark logging overhead per request")
+    parser.add_argument("--requests", type=int, default=20000, help="Simulated requests per setup")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent request threads")
+    args = parser.parse_args()
+
+    setups = [
+        ("basicConfig, f-strings (before)", eager_request, None),
+        ("sync text, lazy", lazy_request, dict(async_logs=False, json_logs=False, sample_rates={})),
+        ("async text, lazy", lazy_request, dict(async_logs=True, json_logs=False, sample_rates={})),
+        ("async JSON, lazy", lazy_request, dict(async_logs=True, json_logs=True, sample_rates={})),
+        ("async JSON, moderation sampled 10%", lazy_request,
+         dict(async_logs=True, json_logs=True, sample_rates={"src.moderation": 0.1})),
+    ]
+
+    print(f"{args.requests} requests on {args.threads} threads, 3 log calls each")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, emit, options in setups:
+            path = os.path.join(tmp, "log.txt")
+            with open(path, "w", encoding="utf-8") as stream:
+                if options is None:
+                    root = logging.getLogger()
+                    for handler in list(root.handlers):
+                        root.removeHandler(handler)
+                    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, stream=stream, force=True)
+                else:
+                    configure_logging(level="INFO", stream=stream, **options)
+                per_request = run(emit, args.requests, args.threads)
+                start = time.perf_counter()
+                stop_logging()
+                drain_ms = (time.perf_counter() - start) * 1000
+                dropped = logging_stats()["sampled_out"] if options else 0
+            lines = sum(1 for _ in open(path, encoding="utf-8"))
+            print(
+                f"  {name:<38} {per_request:7.2f} us/request on request threads | "
+                f"{lines} lines written, {dropped} sampled out, drained in {drain_ms:.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for prompt assembly.
+
+Compares the former prompt builder (re-joining the system prompt and every
+history line on each call, rebuilding the options dict and serializing the
+payload for a disabled debug log) with ModelProvider.build_request, over a
+long-running session whose history window slides one turn per call. Also
+checks that both produce identical prompts.
+
+Usage:
+    python scripts/benchmark_prompt.py
+    python scripts/benchmark_prompt.py --window 50 --calls 20000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import CONTEXT_WINDOW_SIZE, MODEL_KEEP_ALIVE, SYSTEM_PROMPT, get_model_config
+from src.history import ConversationHistory, Role
+from src.model_provider import ModelProvider
+
+logger = logging.getLogger("benchmark")
+
+
+def reference_build_prompt(
+    user_prompt: str,
+    system_prompt: Optional[str] = None,
+    conversation_history: Optional[List[Dict]] = None,
+) -> str:
+    """Prompt builder as it was before the template cache."""
+    parts = []
+    if system_prompt:
+        parts.append(f"### System Instructions ###")
+        parts.append(system_prompt)
+        parts.append("\n### Conversation ###\n")
+    if conversation_history:
+        for turn in conversation_history:
+            role = turn.get("role", "user")
+            content = turn.get("content", "")
+            if role == "user":
+                parts.append(f"User: {content}")
+            elif role == "assistant":
+                parts.append(f"Assistant: {content}")
+        parts.append("")
+    parts.append(f"User: {user_prompt}")
+    parts.append("\n### Response ###")
+    parts.append("Assistant: ")
+    return "\n".join(parts)
+
+
+def reference_build_request(prompt: str, history: List[Dict]) -> Dict:
+    """Request building as it was before the template cache."""
+    full_prompt = reference_build_prompt(prompt, SYSTEM_PROMPT, history)
+    config = get_model_config()
+    request_data = {
+        "model": config["model"],
+        "prompt": full_prompt,
+        "stream": False,
+        "options": config["options"],
+        "keep_alive": MODEL_KEEP_ALIVE,
+    }
+    logger.debug(f"Sending request to model: {json.dumps(request_data, indent=2)}")
+    return request_data
+
+
+def current_build_request(provider: ModelProvider, prompt: str, history) -> Dict:
+    """Request building as generate() does it now."""
+    request_data = provider.build_request(prompt, SYSTEM_PROMPT, history)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Sending request to model: {json.dumps(request_data, indent=2)}")
+    return request_data
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark prompt assembly")
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=CONTEXT_WINDOW_SIZE,
+        help="History entries included in each prompt"
+    )
+    parser.add_argument("--calls", type=int, default=20000, help="Prompts built per variant")
+    parser.add_argument(
+        "--message-chars",
+        type=int,
+        default=600,
+        help="Length of each history message"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    provider = ModelProvider()
+    text = ("I have been feeling anxious about my exams and cannot sleep. " * 20)[:args.message_chars]
+    messages = [f"{i}: {text}" for i in range(args.calls + args.window)]
+
+    # Both variants see the same sliding window: one new turn per call
+    dict_history: List[Dict] = []
+    turn_history = ConversationHistory(args.window)
+    reference_times = []
+    current_times = []
+    for i, message in enumerate(messages):
+        role = Role.USER if i % 2 == 0 else Role.ASSISTANT
+        dict_history = (dict_history + [{"role": role.value, "content": message}])[-args.window:]
+        turn_history.append(role, message)
+        if i < args.window:
+            continue
+
+        start = time.perf_counter()
+        expected = reference_build_request("How can I cope?", dict_history)
+        reference_times.append(time.perf_counter() - start)
+
+        window = turn_history.recent(args.window)
+        start = time.perf_counter()
+        actual = current_build_request(provider, "How can I cope?", window)
+        current_times.append(time.perf_counter() - start)
+
+        if actual["prompt"] != expected["prompt"] or actual["options"] != expected["options"]:
+            print(f"MISMATCH at call {i - args.window}")
+            sys.exit(1)
+
+    prompt_chars = len(expected["prompt"])
+    before = sum(reference_times) / len(reference_times) * 1e6
+    after = sum(current_times) / len(current_times) * 1e6
+    print(f"{args.calls} prompts, window {args.window}, ~{prompt_chars} chars each; outputs identical")
+    print(f"  before: {before:7.2f} us/request")
+    print(f"  after:  {after:7.2f} us/request ({before / after:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
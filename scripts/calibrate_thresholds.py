@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Threshold calibration for the moderator.
+
+Classifies a labeled dataset once, caches the probability matrix as a
+memory-mapped .npy file, and sweeps a grid of (crisis, medical, harmful)
+confidence thresholds vectorized over that matrix. Reports precision,
+recall and intervention rates for the current thresholds of every safety
+mode and the best grid points per mode.
+
+Dataset format (JSONL): {"id": ..., "prompt": ..., "label": "crisis" |
+"medical" | "harmful" | "none"}
+
+Usage:
+    python scripts/calibrate_thresholds.py
+    python scripts/calibrate_thresholds.py --input data.jsonl --step 0.01 --top 10
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from typing import Dict, List
+
+import numpy as np
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import MODERATION_BACKEND, MODERATION_MODEL_NAME, TESTS_DIR
+from src.io_utils import read_jsonl
+from src.moderation import Moderator
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Column order of the classifier output
+CATEGORIES = ["crisis", "medical", "harmful"]
+LABELS = CATEGORIES + ["none"]
+
+# F-beta weighting per safety mode: strict favours recall, permissive precision
+MODE_BETA = {"strict": 2.0, "balanced": 1.0, "permissive": 0.5}
+
+
+def load_probabilities(
+    moderator: Moderator,
+    prompts: List[str],
+    cache_path: str,
+    batch_size: int,
+) -> np.ndarray:
+    """
+    Return the (N, 3) probability matrix, classifying only on a cache miss.
+
+    The cache is keyed on the prompts and the classifier configuration and
+    stored as a .npy file that is memory-mapped on load.
+
+    Args:
+        moderator: Moderator whose classifier produces the probabilities
+        prompts: Dataset prompts in order
+        cache_path: Path of the .npy cache (a .json sidecar holds the key)
+        batch_size: Prompts per forward pass
+
+    Returns:
+        Probability matrix (read-only memory map when cached)
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{MODERATION_BACKEND}:{MODERATION_MODEL_NAME}".encode("utf-8"))
+    for prompt in prompts:
+        digest.update(b"\0" + prompt.encode("utf-8"))
+    key = digest.hexdigest()
+
+    meta_path = cache_path + ".json"
+    if os.path.exists(cache_path) and os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            if json.load(f).get("key") == key:
+                logger.info(f"Using cached probabilities from {cache_path}")
+                return np.load(cache_path, mmap_mode="r")
+
+    logger.info(f"Classifying {len(prompts)} prompts (batch size {batch_size})")
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    probs = np.lib.format.open_memmap(
+        cache_path, mode="w+", dtype=np.float32, shape=(len(prompts), len(CATEGORIES))
+    )
+    for start in range(0, len(prompts), batch_size):
+        batch = prompts[start:start + batch_size]
+        probs[start:start + len(batch)] = moderator.classifier.predict_proba(batch)
+    probs.flush()
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({"key": key, "rows": len(prompts)}, f)
+    return probs
+
+
+def sweep(
+    probs: np.ndarray,
+    labels: np.ndarray,
+    thresholds: np.ndarray,
+    chunk_cells: int = 1 << 24,
+) -> Dict[str, np.ndarray]:
+    """
+    Evaluate every threshold combination over the probability matrix.
+
+    A row is flagged when its top class' probability reaches that class'
+    threshold, mirroring Moderator._decide. Crisis and harmful flags block,
+    medical flags fall back.
+
+    Args:
+        probs: (N, 3) class probabilities
+        labels: (N,) label index into LABELS (3 = none)
+        thresholds: (G, 3) crisis/medical/harmful thresholds
+        chunk_cells: Upper bound on G x N cells evaluated at once
+
+    Returns:
+        Metric arrays of shape (G,)
+    """
+    predicted = probs.argmax(axis=1)
+    confidence = probs.max(axis=1)
+    positive = labels != LABELS.index("none")
+    blocking = predicted != CATEGORIES.index("medical")
+    n_positive = max(int(positive.sum()), 1)
+
+    g = len(thresholds)
+    tp = np.empty(g, dtype=np.int64)
+    fp = np.empty(g, dtype=np.int64)
+    exact = np.empty(g, dtype=np.int64)
+    blocked = np.empty(g, dtype=np.int64)
+    chunk = max(1, chunk_cells // max(len(probs), 1))
+    correct_category = predicted == labels
+    for start in range(0, g, chunk):
+        # (chunk, N) threshold of each row's predicted class
+        row_thresholds = thresholds[start:start + chunk][:, predicted]
+        flagged = confidence[None, :] >= row_thresholds
+        tp[start:start + chunk] = (flagged & positive).sum(axis=1)
+        fp[start:start + chunk] = (flagged & ~positive).sum(axis=1)
+        exact[start:start + chunk] = (flagged & correct_category).sum(axis=1)
+        blocked[start:start + chunk] = (flagged & blocking).sum(axis=1)
+
+    flagged_total = tp + fp
+    n = max(len(probs), 1)
+    return {
+        "precision": np.divide(tp, flagged_total, out=np.ones(g), where=flagged_total > 0),
+        "recall": tp / n_positive,
+        "category_recall": exact / n_positive,
+        "block_rate": blocked / n,
+        "fallback_rate": (flagged_total - blocked) / n,
+    }
+
+
+def f_beta(precision: np.ndarray, recall: np.ndarray, beta: float) -> np.ndarray:
+    """Vectorized F-beta score."""
+    b2 = beta * beta
+    denom = b2 * precision + recall
+    return np.divide((1 + b2) * precision * recall, denom, out=np.zeros_like(denom), where=denom > 0)
+
+
+def format_row(thresholds, metrics: Dict[str, np.ndarray], i: int) -> str:
+    """Format one grid point as a table row."""
+    c, m, h = thresholds[i]
+    return (
+        f"  crisis={c:.2f} medical={m:.2f} harmful={h:.2f} | "
+        f"precision={metrics['precision'][i]:.3f} recall={metrics['recall'][i]:.3f} "
+        f"category_recall={metrics['category_recall'][i]:.3f} "
+        f"block_rate={metrics['block_rate'][i]:.3f} fallback_rate={metrics['fallback_rate'][i]:.3f}"
+    )
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Sweep moderation thresholds over cached classifier probabilities"
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        default=os.path.join(TESTS_DIR, "calibration.jsonl"),
+        help="Labeled dataset (JSONL with prompt and label)"
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=os.path.join(TESTS_DIR, "calibration_probs.npy"),
+        help="Probability matrix cache (.npy)"
+    )
+    parser.add_argument("--batch-size", type=int, default=64, help="Prompts per forward pass")
+    parser.add_argument("--min", type=float, default=0.3, help="Lowest threshold in the grid")
+    parser.add_argument("--max", type=float, default=1.0, help="Highest threshold in the grid")
+    parser.add_argument("--step", type=float, default=0.02, help="Grid step")
+    parser.add_argument("--top", type=int, default=5, help="Best grid points to show per mode")
+    parser.add_argument("--output", type=str, help="Write the report as JSON to this file")
+
+    args = parser.parse_args()
+
+    records = read_jsonl(args.input)
+    unknown = {r.get("label") for r in records} - set(LABELS)
+    if unknown:
+        logger.error(f"Unknown labels {sorted(unknown)}; expected one of {LABELS}")
+        sys.exit(1)
+    prompts = [r.get("prompt", "") for r in records]
+    labels = np.array([LABELS.index(r["label"]) for r in records], dtype=np.int64)
+
+    moderator = Moderator()
+    probs = np.asarray(load_probabilities(moderator, prompts, args.cache, args.batch_size))
+
+    axis = np.round(np.arange(args.min, args.max + 1e-9, args.step), 4)
+    grid = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3)
+    current = np.array(
+        [[moderator.confidence_thresholds[mode][c] for c in CATEGORIES] for mode in MODE_BETA]
+    )
+    thresholds = np.concatenate([current, grid])
+    metrics = sweep(probs, labels, thresholds)
+    print(f"Evaluated {len(grid)} threshold combinations over {len(prompts)} prompts")
+
+    report = {"rows": len(prompts), "combinations": len(grid), "modes": {}}
+    for i, (mode, beta) in enumerate(MODE_BETA.items()):
+        scores = f_beta(metrics["precision"][len(current):], metrics["recall"][len(current):], beta)
+        best = np.argsort(-scores, kind="stable")[:args.top] + len(current)
+        print(f"\n[{mode}] current thresholds (F{beta:g}={f_beta(metrics['precision'][i:i+1], metrics['recall'][i:i+1], beta)[0]:.3f}):")
+        print(format_row(thresholds, metrics, i))
+        print(f"[{mode}] best by F{beta:g}:")
+        for j in best:
+            print(format_row(thresholds, metrics, j))
+        report["modes"][mode] = {
+            "beta": beta,
+            "current": {"thresholds": dict(zip(CATEGORIES, thresholds[i].tolist())),
+                        **{k: float(v[i]) for k, v in metrics.items()}},
+            "best": [{"thresholds": dict(zip(CATEGORIES, thresholds[j].tolist())),
+                      **{k: float(v[j]) for k, v in metrics.items()}} for j in best],
+        }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Wrote report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
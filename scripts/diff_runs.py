@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compare two evaluation runs saved with scripts/evaluate.py --run-store.
+
+Reports safety_action flips per test id, response changes and latency
+deltas, computed over the stored columns.
+
+Usage:
+    python scripts/diff_runs.py BASE HEAD
+    python scripts/diff_runs.py 20240101-120000 20240102-090000 --top 20 --json diff.json
+    python scripts/diff_runs.py --benchmark 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.run_store import ACTIONS, Run, diff_runs, load_run
+
+
+def print_report(diff: dict):
+    """Print a diff as a readable report."""
+    for side in ("base", "head"):
+        meta = diff[side]
+        print(f"{side}: {meta.get('run_name', '?')} ({meta.get('created_at', '?')}, "
+              f"model={meta.get('model_name')}, safety_mode={meta.get('safety_mode')})")
+    print(f"\nCompared {diff['compared']} ids ({diff['added']} added, {diff['removed']} removed)")
+    print(f"Responses changed: {diff['response_changed']}")
+    print(f"safety_action flips: {diff['action_flips']}")
+    for transition, count in sorted(diff["transitions"].items(), key=lambda t: -t[1]):
+        print(f"  {transition}: {count}")
+    for flip in diff["sample_flips"]:
+        print(f"    {flip['id']}: {flip['base']} -> {flip['head']}")
+
+    latency = diff["latency_delta_ms"]
+    print(f"\nLatency p50: {latency['base_p50']:.1f}ms -> {latency['head_p50']:.1f}ms")
+    print(f"Per-id delta: mean {latency['mean']:+.1f}ms, p50 {latency['p50']:+.1f}ms, "
+          f"p95 {latency['p95']:+.1f}ms")
+    if diff["top_regressions"]:
+        print("Largest regressions:")
+        for row in diff["top_regressions"]:
+            print(f"  {row['id']}: {row['base_ms']:.0f}ms -> {row['head_ms']:.0f}ms "
+                  f"({row['delta_ms']:+.0f}ms)")
+
+
+def synthetic_run(n: int, seed: int) -> Run:
+    """Build a random run of n rows for benchmarking."""
+    rng = np.random.default_rng(seed)
+    return Run(
+        ids=np.char.add("test_", np.arange(n).astype(str)),
+        actions=rng.choice(len(ACTIONS) - 1, size=n, p=[0.85, 0.05, 0.08, 0.02]).astype(np.int8),
+        latency_ms=rng.gamma(4, 300, size=n).astype(np.float32),
+        response_hash=rng.integers(0, 2**63, size=n, dtype=np.uint64),
+        metadata={"run_name": f"synthetic-{seed}"},
+    )
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Compare two columnar evaluation runs")
+    parser.add_argument("base", nargs="?", help="Reference run (.npz path or name in the run store)")
+    parser.add_argument("head", nargs="?", help="Run to compare against the reference")
+    parser.add_argument("--top", type=int, default=10, help="Regressions and flips to list")
+    parser.add_argument("--json", type=str, help="Also write the diff as JSON to this file")
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="ROWS",
+        help="Time a diff of two synthetic runs with this many rows instead"
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        base, head = synthetic_run(args.benchmark, 0), synthetic_run(args.benchmark, 1)
+        start = time.perf_counter()
+        diff = diff_runs(base, head, top=args.top)
+        elapsed = time.perf_counter() - start
+        print(f"Diffed {args.benchmark} rows in {elapsed * 1000:.0f}ms "
+              f"({diff['action_flips']} flips)")
+        return
+
+    if not args.base or not args.head:
+        parser.error("base and head runs are required")
+
+    try:
+        base, head = load_run(args.base), load_run(args.head)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    diff = diff_runs(base, head, top=args.top)
+    print_report(diff)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(diff, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
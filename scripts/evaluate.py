@@ -10,25 +10,35 @@ import logging
 import os
 import sys
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 # Add src to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.chat_engine import get_engine
-from src.config import OUTPUTS_FILE, SCHEMA_FILE, TESTS_DIR
+from src.chat_engine import ChatEngine
+from src.config import OUTPUTS_FILE, RUNS_DIR, SCHEMA_FILE, TESTS_DIR
 from src.io_utils import (
+    error_output_record,
     load_schema,
     read_jsonl,
+    to_output_record,
     validate_record,
     write_jsonl,
 )
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from src.logging_utils import configure_logging
+from src.perf_gate import (
+    check_regressions,
+    collect_metrics,
+    format_report,
+    load_baseline,
+    stats_delta,
+    write_baseline,
 )
+from src.run_store import records_to_run, run_metadata, save_run
+from src.warmup import warm_up
+
+# Configure logging (queued, written by a background thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -46,7 +56,7 @@ def evaluate_single(engine, test_case: Dict) -> Dict:
     test_id = test_case.get("id", "unknown")
     prompt = test_case.get("prompt", "")
     
-    logger.info(f"Evaluating test {test_id}")
+    logger.debug("Evaluating test %s", test_id)
     
     try:
         # Reset engine for clean state
@@ -56,37 +66,22 @@ def evaluate_single(engine, test_case: Dict) -> Dict:
         result = engine.process_message(prompt, include_context=False)
         
         # Format output according to schema
-        output = {
-            "id": test_id,
-            "prompt": prompt,
-            "response": result.get("response", ""),
-            "safety_action": result.get("safety_action", "allow"),
-            "policy_tags": result.get("policy_tags", []),
-            "latency_ms": result.get("latency_ms", 0),
-            "model_name": result.get("model_name", "unknown"),
-            "deterministic": result.get("deterministic", True),
-        }
-        
-        return output
+        return to_output_record(test_id, prompt, result)
         
     except Exception as e:
-        logger.error(f"Failed to evaluate test {test_id}: {e}")
-        return {
-            "id": test_id,
-            "prompt": prompt,
-            "response": f"ERROR: {str(e)}",
-            "safety_action": "error",
-            "policy_tags": ["error"],
-            "latency_ms": 0,
-            "model_name": "unknown",
-            "deterministic": False,
-        }
+        logger.error("Failed to evaluate test %s: %s", test_id, e)
+        return error_output_record(test_id, prompt, e)
 
 
 def run_evaluation(
     input_file: str,
     output_file: str,
     schema_file: str,
+    run_store: Optional[str] = None,
+    run_name: Optional[str] = None,
+    baseline_file: Optional[str] = None,
+    tolerance: Optional[float] = None,
+    write_baseline_file: Optional[str] = None,
 ) -> int:
     """
     Run evaluation on all test cases.
@@ -95,6 +90,12 @@ def run_evaluation(
         input_file: Path to input JSONL file
         output_file: Path to output JSONL file
         schema_file: Path to schema JSON file
+        run_store: Directory to also save the run to in columnar form
+        run_name: Name of the saved run (defaults to a timestamp)
+        baseline_file: Fail if performance regressed against this baseline
+        tolerance: Relative regression allowed for every metric, overriding
+            the baseline's and PERF_TOLERANCES
+        write_baseline_file: Write this run's performance metrics here
         
     Returns:
         Exit code (0 for success, non-zero for failure)
@@ -119,18 +120,27 @@ def run_evaluation(
     
     # Initialize engine
     try:
-        engine = get_engine()
+        # Evaluation conversations are throwaway: keep them out of the session store
+        engine = ChatEngine(persistent=False)
         logger.info("Initialized chat engine")
     except Exception as e:
         logger.error(f"Failed to initialize engine: {e}")
         return 1
     
+    # Load models up front so the first test case does not pay for it
+    startup_report = warm_up()
+    if startup_report.errors:
+        logger.error("Warm-up failed in %s; aborting", ", ".join(startup_report.errors))
+        return 1
+    moderation_before = engine.moderator.stats()
+    generation_before = engine.model.generation_stats()
+    
     # Evaluate all test cases
     outputs = []
     failed_validations = []
     
     for i, test_case in enumerate(test_cases, 1):
-        logger.info(f"Processing test {i}/{len(test_cases)}")
+        logger.info("Processing test %d/%d", i, len(test_cases))
         
         # Evaluate
         output = evaluate_single(engine, test_case)
@@ -139,7 +149,7 @@ def run_evaluation(
         # Validate against schema
         if not validate_record(output, schema):
             failed_validations.append(output["id"])
-            logger.warning(f"Test {output['id']} failed schema validation")
+            logger.warning("Test %s failed schema validation", output["id"])
         
         # Brief delay to avoid overwhelming the model
         if i < len(test_cases):
@@ -153,6 +163,12 @@ def run_evaluation(
         logger.error(f"Failed to write outputs: {e}")
         return 1
     
+    if run_store:
+        run_name = run_name or time.strftime("%Y%m%d-%H%M%S")
+        run = records_to_run(outputs, run_metadata(run_name=run_name, input_file=input_file))
+        run_path = save_run(run, os.path.join(run_store, run_name))
+        logger.info(f"Saved run to {run_path}")
+    
     # Print summary
     print("\n" + "="*60)
     print("EVALUATION SUMMARY")
@@ -161,6 +177,10 @@ def run_evaluation(
     print(f"Completed: {len(outputs)}")
     print(f"Schema violations: {len(failed_validations)}")
     
+    print("\nStartup Times:")
+    for phase, duration_ms in startup_report.phases.items():
+        print(f"  {phase}: {duration_ms:.1f}ms")
+    
     # Count safety actions
     safety_counts = {}
     for output in outputs:
@@ -179,8 +199,33 @@ def run_evaluation(
         print(f"  Max: {max(latencies)}ms")
         print(f"  Avg: {sum(latencies)/len(latencies):.1f}ms")
     
+    
+    metrics = collect_metrics(
+        outputs,
+        stats_delta(engine.moderator.stats(), moderation_before),
+        stats_delta(engine.model.generation_stats(), generation_before),
+    )
+    print("\nPerformance:")
+    for name, value in metrics.items():
+        print(f"  {name}: {value:.2f}")
+    
     print("="*60)
     
+    if write_baseline_file:
+        write_baseline(write_baseline_file, metrics)
+        logger.info(f"Wrote performance baseline to {write_baseline_file}")
+    
+    regressions = []
+    if baseline_file:
+        try:
+            rows = check_regressions(metrics, load_baseline(baseline_file), tolerance)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load baseline: {e}")
+            return 1
+        print(f"\nPerformance vs baseline {baseline_file}:")
+        print(format_report(rows))
+        regressions = [row["metric"] for row in rows if row["regressed"]]
+    
     # Determine exit code
     if failed_validations:
         print(f"\nFAILED: {len(failed_validations)} schema violations")
@@ -191,6 +236,10 @@ def run_evaluation(
         print(f"\nFAILED: Only {len(outputs)}/{len(test_cases)} tests completed")
         return 1
     
+    if regressions:
+        print(f"\nFAILED: Performance regressed beyond tolerance: {', '.join(regressions)}")
+        return 1
+    
     print("\nPASSED: All tests completed successfully")
     return 0
 
@@ -218,6 +267,33 @@ def main():
         default=SCHEMA_FILE,
         help="Output schema file (JSON)"
     )
+    parser.add_argument(
+        "--run-store",
+        type=str,
+        nargs="?",
+        const=RUNS_DIR,
+        help=f"Also save the run in columnar form to this directory (default {RUNS_DIR})"
+    )
+    parser.add_argument(
+        "--run-name",
+        type=str,
+        help="Name of the saved run (defaults to a timestamp)"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        help="Performance baseline (JSON); exit non-zero if metrics regress beyond tolerance"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="Relative regression allowed for every metric (e.g. 0.2), overriding the baseline's"
+    )
+    parser.add_argument(
+        "--write-baseline",
+        type=str,
+        help="Write this run's performance metrics as a baseline file"
+    )
     
     args = parser.parse_args()
     
@@ -226,6 +302,11 @@ def main():
         input_file=args.input,
         output_file=args.output,
         schema_file=args.schema,
+        run_store=args.run_store,
+        run_name=args.run_name,
+        baseline_file=args.baseline,
+        tolerance=args.tolerance,
+        write_baseline_file=args.write_baseline,
     )
     
     sys.exit(exit_code)
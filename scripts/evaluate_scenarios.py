@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Multi-turn scenario evaluation.
+
+Plays scripted conversations with context enabled, many at once, so the
+parts of the pipeline whose cost grows with session length (context
+building, history trimming and the conversation-limit warning) are
+exercised. Reports latency and prompt size per turn index.
+
+Scenario format (JSONL): {"id": ..., "description": ..., "turns": ["...", ...]}
+
+Usage:
+    python scripts/evaluate_scenarios.py
+    python scripts/evaluate_scenarios.py --repeat 10 --concurrency 8 --output tests/scenario_outputs.jsonl
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.admission import AdmissionRejected
+from src.chat_engine import ChatEngine
+from src.config import CONTEXT_WINDOW_SIZE, MAX_CONVERSATION_TURNS, SYSTEM_PROMPT, TESTS_DIR
+from src.io_utils import read_jsonl, write_jsonl
+from src.logging_utils import configure_logging
+from src.warmup import warm_up
+
+# Configure logging (queued, written by a background thread)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Appended to responses as the conversation nears MAX_CONVERSATION_TURNS
+LIMIT_NOTE = "[Note: We're approaching our conversation limit"
+
+
+def play_scenario(scenario: Dict, run: int) -> List[Dict]:
+    """
+    Play one scenario in a fresh conversation with context enabled.
+
+    Args:
+        scenario: Scenario with 'id' and ordered 'turns'
+        run: Repetition number, to tell concurrent copies apart
+
+    Returns:
+        One record per turn
+    """
+    engine = ChatEngine(persistent=False)
+    records = []
+    for turn_index, message in enumerate(scenario["turns"]):
+        # Size of the prompt the model would get for this turn
+        prompt_chars = len(engine.model.build_request(
+            message, SYSTEM_PROMPT, engine.conversation_history.recent(CONTEXT_WINDOW_SIZE)
+        )["prompt"])
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    result = engine.process_message(message, include_context=True)
+                    break
+                except AdmissionRejected as e:
+                    time.sleep(e.retry_after)
+        except Exception as e:
+            logger.error("Scenario %s turn %d failed: %s", scenario["id"], turn_index, e)
+            result = {"safety_action": "error", "response": "", "turn_count": engine.turn_count}
+        records.append({
+            "scenario_id": scenario["id"],
+            "run": run,
+            "turn_index": turn_index,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "prompt_chars": prompt_chars,
+            "history_size": len(engine.conversation_history),
+            "safety_action": result["safety_action"],
+            "limit_warning": LIMIT_NOTE in result["response"],
+            "turn_count": result["turn_count"],
+        })
+    return records
+
+
+def summarize(records: List[Dict]):
+    """Print latency and prompt size per turn index."""
+    by_turn = defaultdict(list)
+    for record in records:
+        by_turn[record["turn_index"]].append(record)
+
+    print(f"\n{'turn':>4} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'prompt chars':>13} {'history':>8}  actions")
+    for turn_index in sorted(by_turn):
+        group = by_turn[turn_index]
+        latencies = np.array([r["latency_ms"] for r in group])
+        prompt_chars = np.mean([r["prompt_chars"] for r in group])
+        history = np.mean([r["history_size"] for r in group])
+        actions = Counter(r["safety_action"] for r in group)
+        warnings = sum(r["limit_warning"] for r in group)
+        print(
+            f"{turn_index + 1:>4} {len(group):>5} {np.percentile(latencies, 50):>9.1f} "
+            f"{np.percentile(latencies, 95):>9.1f} {prompt_chars:>13.0f} {history:>8.1f}  "
+            + ", ".join(f"{a}={n}" for a, n in sorted(actions.items()))
+            + (f", limit_warning={warnings}" if warnings else "")
+        )
+
+    first = [r["prompt_chars"] for r in by_turn[min(by_turn)]]
+    last = [r["prompt_chars"] for r in by_turn[max(by_turn)]]
+    print(f"\nPrompt growth: {np.mean(first):.0f} chars at turn 1 -> {np.mean(last):.0f} "
+          f"at turn {max(by_turn) + 1} (context window {CONTEXT_WINDOW_SIZE}, "
+          f"limit {MAX_CONVERSATION_TURNS} turns)")
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Play multi-turn scenarios concurrently with context enabled"
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        default=os.path.join(TESTS_DIR, "scenarios.jsonl"),
+        help="Scenario file (JSONL)"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Copies of each scenario to play")
+    parser.add_argument("--concurrency", type=int, default=4, help="Conversations played at once")
+    parser.add_argument("--output", type=str, help="Write per-turn records to this JSONL file")
+
+    args = parser.parse_args()
+
+    scenarios = read_jsonl(args.input)
+    jobs = [(scenario, run) for run in range(args.repeat) for scenario in scenarios]
+    startup_report = warm_up()
+    if startup_report.errors:
+        logger.error("Warm-up failed in %s; aborting", ", ".join(startup_report.errors))
+        sys.exit(1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda job: play_scenario(*job), jobs))
+    elapsed = time.perf_counter() - start
+
+    records = [record for conversation in results for record in conversation]
+    print(f"Played {len(jobs)} conversations ({len(records)} turns) "
+          f"with concurrency {args.concurrency} in {elapsed:.1f}s")
+    summarize(records)
+
+    if args.output:
+        write_jsonl(records, args.output)
+        logger.info("Wrote per-turn records to %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
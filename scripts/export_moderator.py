@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Export the moderation classifier to ONNX for the onnx moderation backend.
+
+Writes model.onnx (and optionally a dynamically quantized model.int8.onnx),
+the tokenizer and export metadata to the output directory. With --verify,
+checks that the exported model assigns the same labels and moderation
+actions as the PyTorch model on the test inputs and exits non-zero if not.
+
+Usage:
+    python scripts/export_moderator.py --int8 --verify
+    CS3249_MODERATION_BACKEND=onnx python app/backend.py
+    CS3249_MODERATION_BACKEND=onnx CS3249_MODERATION_ONNX_FILE=model.int8.onnx python app/backend.py
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import List
+
+# Add src to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import MODERATION_ONNX_DIR, TESTS_DIR
+from src.io_utils import read_jsonl
+from src.moderation import Moderator, TorchClassifier
+from src.onnx_classifier import METADATA_FILE, OnnxClassifier
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def export(classifier: TorchClassifier, output_dir: str, opset: int) -> str:
+    """
+    Export the loaded PyTorch model to ONNX.
+
+    Args:
+        classifier: Loaded PyTorch classifier
+        output_dir: Directory to write the model, tokenizer and metadata to
+        opset: ONNX opset version
+
+    Returns:
+        Path of the exported model
+    """
+    import inspect
+
+    import torch
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, "model.onnx")
+
+    tokenizer = classifier.tokenizer
+    sample = tokenizer(["Hello there", "How are you?"], return_tensors="pt", padding=True)
+    # Newer torch versions default to the dynamo exporter; keep the TorchScript one
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+    torch.onnx.export(
+        classifier.model,
+        (sample["input_ids"], sample["attention_mask"]),
+        model_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset,
+        **export_kwargs,
+    )
+
+    # The runtime loads tokenizer.json with the `tokenizers` library
+    tokenizer.save_pretrained(output_dir)
+    metadata = {
+        "source_model": classifier.model_name,
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": tokenizer.pad_token_id,
+        "max_length": min(tokenizer.model_max_length, 512),
+        "labels": ["crisis", "medical", "harmful"],
+    }
+    with open(os.path.join(output_dir, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    logger.info(f"Exported ONNX model to {model_path}")
+    return model_path
+
+
+def quantize(model_path: str) -> str:
+    """
+    Dynamically quantize weights to int8.
+
+    Args:
+        model_path: Path of the float model
+
+    Returns:
+        Path of the quantized model
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = model_path.replace(".onnx", ".int8.onnx")
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"Wrote int8 model to {quantized_path}")
+    return quantized_path
+
+
+def verify(reference: TorchClassifier, output_dir: str, model_file: str, prompts: List[str]) -> bool:
+    """
+    Check label and moderation-action agreement with the PyTorch model.
+
+    Args:
+        reference: Loaded PyTorch classifier that was exported
+        output_dir: Export directory
+        model_file: Exported model file to check
+        prompts: Texts to compare on
+
+    Returns:
+        True if every prompt gets the same label and action
+    """
+    exported = OnnxClassifier(output_dir, model_file)
+    torch_moderator = Moderator(reference)
+    onnx_moderator = Moderator(exported)
+
+    torch_probs = reference.predict_proba(prompts)
+    onnx_probs = exported.predict_proba(prompts)
+
+    mismatches = []
+    max_diff = 0.0
+    for prompt, p_torch, p_onnx in zip(prompts, torch_probs, onnx_probs):
+        max_diff = max(max_diff, max(abs(a - b) for a, b in zip(p_torch, p_onnx)))
+        label_torch = p_torch.index(max(p_torch))
+        label_onnx = p_onnx.index(max(p_onnx))
+        action_torch = torch_moderator._decide(p_torch).action
+        action_onnx = onnx_moderator._decide(p_onnx).action
+        if label_torch != label_onnx or action_torch != action_onnx:
+            mismatches.append(prompt)
+
+    agreement = 1 - len(mismatches) / len(prompts)
+    print(f"{model_file}: label/action agreement {agreement:.1%} "
+          f"over {len(prompts)} prompts, max probability diff {max_diff:.2e}")
+    for prompt in mismatches:
+        print(f"  MISMATCH: {prompt}")
+    return not mismatches
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Export the moderation classifier to ONNX"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=MODERATION_ONNX_DIR,
+        help="Output directory"
+    )
+    parser.add_argument(
+        "--int8",
+        action="store_true",
+        help="Also write a dynamically quantized int8 model"
+    )
+    parser.add_argument(
+        "--opset",
+        type=int,
+        default=17,
+        help="ONNX opset version"
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check label agreement with PyTorch on the test inputs"
+    )
+    parser.add_argument(
+        "--input",
+        type=str,
+        default=os.path.join(TESTS_DIR, "inputs.jsonl"),
+        help="Prompts used by --verify (JSONL)"
+    )
+
+    args = parser.parse_args()
+
+    classifier = TorchClassifier()
+    classifier.load()
+    model_path = export(classifier, args.output, args.opset)
+    model_files = [os.path.basename(model_path)]
+    if args.int8:
+        model_files.append(os.path.basename(quantize(model_path)))
+
+    if not args.verify:
+        sys.exit(0)
+
+    prompts = [record["prompt"] for record in read_jsonl(args.input)]
+    results = [verify(classifier, args.output, name, prompts) for name in model_files]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
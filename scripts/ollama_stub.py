@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Ollama API with deterministic timing.
+
+Serves /api/generate (streamed and non-streamed), /api/tags and /api/ps.
+Responses are canned, and each request takes a fixed time derived from the
+prompt length and the number of generated tokens, so performance runs
+against it are repeatable and independent of hardware.
+
+Usage:
+    python scripts/ollama_stub.py --port 11434
+    python scripts/evaluate.py --write-baseline perf_baseline.json   # on the reference version
+    python scripts/evaluate.py --baseline perf_baseline.json         # on the change under test
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+RESPONSE_TEXT = (
+    "Thank you for sharing that with me. It sounds like you have a lot on your mind. "
+    "Would you like to tell me more about what has been going on?"
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Handles Ollama API requests."""
+
+    protocol_version = "HTTP/1.1"
+    model_name = "phi3:mini"
+    tokens_per_second = 40.0
+    prompt_tokens_per_second = 2000.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload: Dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, payload: Dict):
+        line = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": self.model_name, "model": self.model_name}]})
+        elif self.path == "/api/ps":
+            self._send_json({"models": [{"name": self.model_name, "model": self.model_name}]})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, 404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        model = request.get("model", self.model_name)
+        prompt = request.get("prompt", "")
+        if not prompt:
+            # Preload request
+            self._send_json({"model": model, "response": "", "done": True})
+            return
+
+        words = RESPONSE_TEXT.split(" ")
+        words = words[:request.get("options", {}).get("num_predict", len(words))]
+        # Roughly four characters per prompt token
+        prompt_tokens = max(1, len(prompt) // 4)
+        prompt_s = prompt_tokens / self.prompt_tokens_per_second
+        token_s = 1 / self.tokens_per_second
+        final = {
+            "model": model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_s * 1e9),
+            "eval_count": len(words),
+            "eval_duration": int(len(words) * token_s * 1e9),
+        }
+        final["total_duration"] = final["prompt_eval_duration"] + final["eval_duration"]
+
+        time.sleep(prompt_s)
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, word in enumerate(words):
+                time.sleep(token_s)
+                self._send_chunk({"model": model, "response": word if i == 0 else " " + word, "done": False})
+            self._send_chunk({**final, "response": ""})
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(len(words) * token_s)
+            self._send_json({**final, "response": " ".join(words)})
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Deterministic local stand-in for Ollama")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to bind")
+    parser.add_argument("--port", type=int, default=11434, help="Port to listen on")
+    parser.add_argument("--model", type=str, default=StubHandler.model_name, help="Model name to report")
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=StubHandler.tokens_per_second,
+        help="Simulated generation speed"
+    )
+    parser.add_argument(
+        "--prompt-tokens-per-second",
+        type=float,
+        default=StubHandler.prompt_tokens_per_second,
+        help="Simulated prompt processing speed"
+    )
+    args = parser.parse_args()
+
+    StubHandler.model_name = args.model
+    StubHandler.tokens_per_second = args.tokens_per_second
+    StubHandler.prompt_tokens_per_second = args.prompt_tokens_per_second
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Ollama stub serving {args.model} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Admission control for model generation.
+
+Limits how many generations run at once, queues a bounded number of waiting
+requests in priority order and rejects the rest with a retry hint. Requests
+resolved by moderation alone never enter this queue.
+"""
+
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from .config import ADMISSION_QUEUE_SIZE, MAX_CONCURRENT_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a request cannot be admitted; carries a retry hint."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued request waiting for a generation slot."""
+
+    __slots__ = ("event", "granted", "cancelled")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    """Bounded priority queue in front of a fixed number of generation slots."""
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+        max_queue: int = ADMISSION_QUEUE_SIZE,
+    ):
+        """
+        Initialize the controller.
+
+        Args:
+            max_concurrent: Generations allowed to run at once
+            max_queue: Requests allowed to wait for a slot
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._active = 0
+        self._queue: List = []  # heap of (priority, seq, waiter)
+        self._queued = 0  # waiters in the heap that are not cancelled
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._hold_ewma_ms = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _retry_after(self) -> float:
+        """Estimate seconds until a slot frees up for a new request."""
+        hold_s = (self._hold_ewma_ms or 1000.0) / 1000
+        return max(1.0, math.ceil(hold_s * (self._queued + 1) / self.max_concurrent))
+
+    def _acquire(self, priority: int, timeout: Optional[float]):
+        with self._lock:
+            if self._active < self.max_concurrent and not self._queued:
+                self._active += 1
+                self.admitted += 1
+                return
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected("Generation queue is full", self._retry_after())
+            waiter = _Waiter()
+            heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+            self._queued += 1
+
+        waiter.event.wait(timeout)
+        with self._lock:
+            if waiter.granted:
+                self.admitted += 1
+                return
+            waiter.cancelled = True
+            self._queued -= 1
+            self.timed_out += 1
+            raise AdmissionRejected("Timed out waiting for a generation slot", self._retry_after())
+
+    def _release(self, held_ms: float):
+        with self._lock:
+            self._hold_ewma_ms += 0.2 * (held_ms - self._hold_ewma_ms) if self._hold_ewma_ms else held_ms
+            while self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                # Hand the slot straight to the next waiter
+                self._queued -= 1
+                waiter.granted = True
+                waiter.event.set()
+                return
+            self._active -= 1
+
+    @contextmanager
+    def slot(
+        self,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None,
+    ) -> Iterator[None]:
+        """
+        Hold a generation slot for the duration of the block.
+
+        Args:
+            priority: Scheduling class (lower is served first)
+            timeout: Maximum seconds to wait in the queue
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out
+        """
+        self._acquire(priority, timeout)
+        start = time.time()
+        try:
+            yield
+        finally:
+            self._release((time.time() - start) * 1000)
+
+    def stats(self) -> Dict:
+        """Return admission counters and current load."""
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": self._queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_generation_ms": round(self._hold_ewma_ms, 1),
+            }
+
+
+# Singleton instance
+_admission_instance = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get singleton admission controller instance."""
+    global _admission_instance
+    if _admission_instance is None:
+        _admission_instance = AdmissionController()
+    return _admission_instance
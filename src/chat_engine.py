@@ -5,15 +5,36 @@ Students must complete TODO sections to implement safe conversation management.
 
 import json
 import logging
+import threading
 import time
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 from .config import (
+    BATCH_MAX_CONCURRENCY,
+    MODERATION_BATCH_SIZE,
     SYSTEM_PROMPT,
     MAX_CONVERSATION_TURNS,
     CONTEXT_WINDOW_SIZE,
+    COALESCE_IDENTICAL_REQUESTS,
+    SESSION_CACHE_SIZE,
+    SESSION_PERSISTENCE,
 )
+from .admission import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    AdmissionRejected,
+    get_admission_controller,
+)
+from .history import ConversationHistory, Role, Turn
+from .io_utils import error_output_record, to_output_record
 from .model_provider import get_provider
+from .resilience import CircuitOpenError, Deadline
+from .routing import get_router
+from .semantic_cache import get_semantic_cache
+from .session_store import get_session_store, is_valid_session_id, new_session_id
+from .singleflight import SingleFlight
 from .moderation import (
     ModerationAction,
     ModerationResult,
@@ -22,23 +43,50 @@ from .moderation import (
 
 logger = logging.getLogger(__name__)
 
+# Shared by all engines so identical concurrent requests from different
+# sessions coalesce into one model call and one output moderation pass
+_generation_flight = SingleFlight()
+
+ERROR_RESPONSE = "I apologize, but I'm having trouble processing your message. Please try again."
+
 
 class ChatEngine:
     """Orchestrates conversation flow with safety checks."""
     
-    def __init__(self):
-        """Initialize chat engine with model and moderator."""
+    def __init__(self, session_id: Optional[str] = None, persistent: bool = SESSION_PERSISTENCE):
+        """
+        Initialize chat engine with model and moderator.
+        
+        Args:
+            session_id: Existing session to resume; its turns are read from
+                the session store when the first message arrives
+            persistent: Record turns in the session store
+        """
         self.model = get_provider()
         self.moderator = get_moderator()
-        self.conversation_history: List[Dict] = []
+        self.admission = get_admission_controller()
+        self.router = get_router()
+        # Only available when the moderator produces embeddings
+        self.semantic_cache = get_semantic_cache() if self.moderator.embeddings else None
+        self.store = get_session_store() if persistent else None
+        # Each turn has 2 messages; the oldest are evicted beyond the window
+        self.conversation_history = ConversationHistory(CONTEXT_WINDOW_SIZE * 2)
         self.turn_count = 0 # number of user->assistant turns completed
-        self.session_id = f"session_{int(time.time())}"
+        self.session_id = session_id or new_session_id()
         self.first_interaction = True
+        self._rehydrated = session_id is None
+        # Guards history, turn count and disclaimer state; not held while
+        # the model generates, so concurrent messages only overlap there
+        self._state_lock = threading.Lock()
     
     def process_message(
         self,
         user_input: str,
         include_context: bool = True,
+        deadline: Optional[Deadline] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        input_moderation: Optional[ModerationResult] = None,
+        on_token: Optional[Callable[[str], None]] = None,
     ) -> Dict:
         
         """
@@ -58,6 +106,13 @@ class ChatEngine:
         Args:
             user_input: User's message
             include_context: Whether to include conversation history
+            deadline: End-to-end deadline for the request (None for no limit)
+            priority: Admission priority for the generation slot
+            input_moderation: Precomputed input moderation (e.g. from a
+                batched pass); computed here if None
+            on_token: If given, model output is streamed through this
+                callback before output moderation; the returned response
+                is authoritative and may differ if moderation replaced it
             
         Returns:
             Dict containing response and metadata with keys:
@@ -70,19 +125,32 @@ class ChatEngine:
             - latency_ms: Processing time in milliseconds
             - turn_count: Current conversation turn number
             - session_id: Unique session identifier
+            
+        Raises:
+            AdmissionRejected: If no generation slot could be obtained;
+                the message was not processed and may be retried
         """
 
         start_time = time.time()
-        
-        # Step 1: Handle first interaction disclaimer
-        disclaimer = None
-        if self.first_interaction:
-            self.first_interaction = False
-            # Get disclaimer to include in response
-            disclaimer = self.moderator.get_disclaimer()
+        with self._state_lock:
+            self._sync_session()
+            
+            # Step 1: Handle first interaction disclaimer
+            disclaimer = None
+            if self.first_interaction:
+                self.first_interaction = False
+                # Get disclaimer to include in response
+                disclaimer = self.moderator.get_disclaimer()
+            
+            # History as of this message; later turns of concurrent
+            # messages are not part of its context
+            recent = self.conversation_history.recent(CONTEXT_WINDOW_SIZE) \
+                if self.conversation_history else None
+        context = recent if include_context else None
 
         # Step 2: Moderate user input
-        input_moderation = self._moderate_input(user_input)
+        if input_moderation is None:
+            input_moderation = self._moderate_input(user_input, recent)
 
         # TODO: Step 3 - Handle moderation results
         # CRITICAL: Different actions require different handling:
@@ -92,122 +160,357 @@ class ChatEngine:
         
         # TODO: Handle moderation result
         if input_moderation.action == ModerationAction.BLOCK:
-            final_response = self._prepare_final_response(
-                user_input=user_input,
-                model_response={"response": "", "model": "blocked", "deterministic": True},
-                input_moderation=input_moderation,
-                output_moderation=ModerationResult(action=ModerationAction.ALLOW, tags=[], reason="", confidence=1.0),
+            return self._finish_turn(
+                user_input,
+                {"response": "", "model": "blocked", "deterministic": True},
+                input_moderation,
+                ModerationResult(action=ModerationAction.ALLOW, tags=[], reason="", confidence=1.0),
+                disclaimer,
+                start_time,
             )
-            if disclaimer:
-                final_response["response"] = f"{disclaimer}\n\n---\n\n{final_response['response']}"
-            self._update_history(user_input, final_response["response"])
-            final_response["latency_ms"] = int((time.time() - start_time) * 1000)
-            final_response["turn_count"] = self.turn_count
-            final_response["session_id"] = self.session_id
-            return final_response
 
         elif input_moderation.action == ModerationAction.SAFE_FALLBACK:
+            return self._finish_turn(
+                user_input,
+                {"response": "", "model": "safe_fallback", "deterministic": True},
+                input_moderation,
+                ModerationResult(action=ModerationAction.ALLOW, tags=[], reason="", confidence=1.0),
+                disclaimer,
+                start_time,
+            )
+        
+        # Context-free messages may be answered from the semantic cache
+        cacheable = self.semantic_cache is not None and not context
+        cached = self.semantic_cache.lookup(input_moderation, user_input) if cacheable else None
+        if cached is not None:
+            if on_token is not None:
+                on_token(cached["response"])
+            model_response = {
+                "response": cached["response"],
+                "model": cached["model"],
+                "deterministic": True,
+                "cache_similarity": cached["similarity"],
+            }
+            output_moderation = ModerationResult(action=ModerationAction.ALLOW, tags=[], reason="", confidence=1.0)
+        else:
+            # Steps 3-4: Generate model response (input passed moderation) and
+            # moderate it, sharing the work with identical in-flight requests.
+            # Short low-risk turns are routed to the fast model if configured.
+            model = self.router.route(user_input, input_moderation)
+            try:
+                model_response, output_moderation = self._generate_and_moderate(
+                    user_input,
+                    context,
+                    deadline,
+                    priority,
+                    on_token,
+                    model,
+                )
+            except AdmissionRejected:
+                # Nothing was answered, so the retried message should still
+                # get the disclaimer
+                if disclaimer:
+                    with self._state_lock:
+                        self.first_interaction = True
+                raise
+            if (
+                cacheable
+                and "error" not in model_response
+                and output_moderation.action == ModerationAction.ALLOW
+            ):
+                self.semantic_cache.insert(input_moderation, user_input, model_response["response"], model_response["model"])
+        
+        final_response = self._finish_turn(
+            user_input,
+            model_response,
+            input_moderation,
+            output_moderation,
+            disclaimer,
+            start_time,
+        )
+        if cached is not None:
+            final_response["cache_hit"] = True
+        
+        return final_response
+    
+    def _finish_turn(
+        self,
+        user_input: str,
+        model_response: Dict,
+        input_moderation: ModerationResult,
+        output_moderation: ModerationResult,
+        disclaimer: Optional[str],
+        start_time: float,
+    ) -> Dict:
+        """Prepare the final response and record the turn, atomically with respect to other messages."""
+        with self._state_lock:
+            # Step 5: Prepare final response based on all moderation results
             final_response = self._prepare_final_response(
                 user_input=user_input,
-                model_response={"response": "", "model": "safe_fallback", "deterministic": True},
+                model_response=model_response,
                 input_moderation=input_moderation,
-                output_moderation=ModerationResult(action=ModerationAction.ALLOW, tags=[], reason="", confidence=1.0),
+                output_moderation=output_moderation,
             )
+            
+            # Add disclaimer if first interaction
             if disclaimer:
                 final_response["response"] = f"{disclaimer}\n\n---\n\n{final_response['response']}"
+            
+            # Step 6: Update conversation history
             self._update_history(user_input, final_response["response"])
+            
+            # Step 7: Add metadata
             final_response["latency_ms"] = int((time.time() - start_time) * 1000)
             final_response["turn_count"] = self.turn_count
             final_response["session_id"] = self.session_id
-            return final_response
-        
-        # Step 3: Generate model response (input passed moderation)
-        model_response = self._generate_response(
-            user_input,
-            include_context
-        )
-        
-        # Step 4: Moderate model output
-        output_moderation = self._moderate_output(
-            user_input,
-            model_response["response"]
-        )
-        
-        # Step 5: Prepare final response based on all moderation results
-        final_response = self._prepare_final_response(
-            user_input=user_input,
-            model_response=model_response,
-            input_moderation=input_moderation,
-            output_moderation=output_moderation,
-        )
+        return final_response
+    
+    def process_batch(
+        self,
+        items: List[Dict],
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    ) -> Iterator[Dict]:
+        """
+        Process many independent single-turn prompts.
         
-        # Add disclaimer if first interaction
-        if disclaimer:
-            final_response["response"] = f"{disclaimer}\n\n---\n\n{final_response['response']}"
+        Each item is handled like a test case in scripts/evaluate.py: a
+        fresh conversation without context. Inputs are moderated in batched
+        forward passes; allowed prompts are generated with at most
+        max_concurrency model calls in flight at batch priority.
         
-        # Step 6: Update conversation history
-        self._update_history(user_input, final_response["response"])
+        Args:
+            items: Dicts with 'id' and 'prompt'
+            max_concurrency: Concurrent generations for this batch
+            
+        Yields:
+            Output records (evaluation schema) in completion order
+        """
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="batch")
+        pending = set()
+        try:
+            for start in range(0, len(items), MODERATION_BATCH_SIZE):
+                chunk = items[start:start + MODERATION_BATCH_SIZE]
+                moderations = self.moderator.check_batch([item.get("prompt", "") for item in chunk])
+                for item, moderation in zip(chunk, moderations):
+                    if moderation.action != ModerationAction.ALLOW:
+                        # Resolved by moderation alone: no model call needed
+                        yield self._process_batch_item(item, moderation)
+                    else:
+                        pending.add(executor.submit(self._process_batch_item, item, moderation))
+                
+                # Keep a bounded amount of work queued ahead of the model
+                while len(pending) >= max_concurrency * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # Stop queued work if the consumer goes away early
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    @staticmethod
+    def _process_batch_item(item: Dict, input_moderation: ModerationResult) -> Dict:
+        """Process one batch item in a fresh conversation."""
+        item_id = item.get("id", "unknown")
+        prompt = item.get("prompt", "")
+        try:
+            engine = ChatEngine(persistent=False)
+            while True:
+                try:
+                    result = engine.process_message(
+                        prompt,
+                        include_context=False,
+                        priority=PRIORITY_BATCH,
+                        input_moderation=input_moderation,
+                    )
+                    break
+                except AdmissionRejected as e:
+                    # Offline work waits for capacity instead of failing
+                    time.sleep(e.retry_after)
+            return to_output_record(item_id, prompt, result)
+        except Exception as e:
+            logger.error("Failed to process batch item %s: %s", item_id, e)
+            return error_output_record(item_id, prompt, e)
+    
+    def expect_turn_count(self, turn_count: int):
+        """
+        Note the turn count a client last saw for this session.
         
-        # Step 7: Add metadata
-        final_response["latency_ms"] = int((time.time() - start_time) * 1000)
-        final_response["turn_count"] = self.turn_count
-        final_response["session_id"] = self.session_id
+        If it is ahead of this engine, another worker has recorded turns
+        since, and the session is reloaded from the store on the next message.
+        """
+        with self._state_lock:
+            if turn_count > self.turn_count:
+                self._rehydrated = False
+    
+    def _sync_session(self):
+        """
+        Load the session's turns from the store if this engine may be behind it.
         
-        return final_response
+        Called with the state lock held. The store is only read on the first
+        message of a resumed session and after expect_turn_count() found the
+        engine stale, so other messages never touch the disk.
+        """
+        if self.store is None or self._rehydrated:
+            return
+        loaded = self.store.load(self.session_id, limit=CONTEXT_WINDOW_SIZE * 2)
+        self._rehydrated = True
+        if loaded is None:
+            return
+        turns, self.turn_count = loaded
+        self.conversation_history.load(turns)
+        self.first_interaction = False
+        logger.info("Rehydrated session %s at turn %d", self.session_id, self.turn_count)
     
-    def _moderate_input(self, user_input: str) -> ModerationResult:
+    def _moderate_input(self, user_input: str, context: Optional[List[Turn]] = None) -> ModerationResult:
         """
         Implement input moderation.
         
         - Calls moderator with user input
-        - Considers conversation context
+        - Considers conversation context (recent history turns)
         - Returns moderation result
         """
-        # Get relevant context from conversation history
-        context = self.conversation_history[-CONTEXT_WINDOW_SIZE:] \
-            if self.conversation_history else None
-        
         return self.moderator.moderate(
             user_prompt=user_input,
             context=context,
         )
     
+    def _generate_and_moderate(
+        self,
+        user_input: str,
+        context: Optional[List[Turn]],
+        deadline: Optional[Deadline] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        on_token: Optional[Callable[[str], None]] = None,
+        model: Optional[str] = None,
+    ) -> Tuple[Dict, ModerationResult]:
+        """
+        Generate a response and moderate it, coalescing identical requests.
+        
+        Concurrent requests whose built prompt and options are identical
+        (and deterministic) share a single model call and output moderation.
+        Only the request doing the work waits for a generation slot.
+        Streaming requests are never coalesced. The prompt built for the
+        coalescing key is the one sent to the model.
+        """
+        request = None
+        
+        def run() -> Tuple[Dict, ModerationResult]:
+            with self.admission.slot(
+                priority,
+                timeout=deadline.remaining() if deadline else None,
+            ):
+                model_response = self._generate_response(
+                    user_input, context, deadline, on_token, model, request
+                )
+            output_moderation = self._moderate_output(user_input, model_response["response"])
+            return model_response, output_moderation
+        
+        if not COALESCE_IDENTICAL_REQUESTS or on_token is not None:
+            return run()
+        
+        request = self.model.build_request(user_input, SYSTEM_PROMPT, context, model)
+        if request["options"]["temperature"] != 0:
+            return run()
+        
+        try:
+            (model_response, output_moderation), shared = _generation_flight.do(
+                self.model.request_key(request),
+                run,
+                timeout=deadline.remaining() if deadline else None,
+            )
+        except TimeoutError as e:
+            logger.error("Model generation failed: %s", e)
+            model_response = self._error_response(e)
+            return model_response, self._moderate_output(user_input, model_response["response"])
+        
+        if shared:
+            model_response = dict(model_response, coalesced=True)
+        return model_response, output_moderation
+    
     def _generate_response(
         self,
         user_input: str,
-        include_context: bool,
+        context: Optional[List[Turn]],
+        deadline: Optional[Deadline] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        model: Optional[str] = None,
+        request: Optional[Dict] = None,
     ) -> Dict:
         """
         Generate model response with appropriate prompting.
         
-        - Builds prompt with system instructions
+        - Builds prompt with system instructions, unless request already
+          holds the payload built for model
         - Includes relevant context
-        - Calls model provider
+        - Calls model provider on the routed model, escalating to the
+          primary model if the fast model fails before streaming anything
         - Handles errors gracefully
         """
+        streamed = []
+        if on_token is not None:
+            def on_token_tracked(token: str):
+                streamed.append(True)
+                on_token(token)
+        else:
+            on_token_tracked = None
+        
         try:
-            context = None
-            if include_context and self.conversation_history:
-                # Prepare context (last N turns)
-                context = self.conversation_history[-CONTEXT_WINDOW_SIZE:]
-            
-            response = self.model.generate(
+            return self.model.generate(
                 prompt=user_input,
                 system_prompt=SYSTEM_PROMPT,
                 conversation_history=context,
+                deadline=deadline,
+                on_token=on_token_tracked,
+                model=model,
+                request=request,
             )
-            
-            return response
-            
         except Exception as e:
-            logger.error(f"Model generation failed: {e}")
-            # Return appropriate error response
-            return {
-                "response": "I apologize, but I'm having trouble processing your message. Please try again.",
-                "error": str(e),
-                "model": "error",
-                "deterministic": False,
-            }
+            # Breakers are per model, so an open fast-model circuit escalates too
+            escalate = (
+                model is not None
+                and model != self.model.model_name
+                and not streamed
+                and (deadline is None or not deadline.expired)
+            )
+            if not escalate:
+                return self._generation_failed(e)
+            logger.warning("Fast model %s failed, escalating to %s: %s", model, self.model.model_name, e)
+            self.router.record_escalation()
+        
+        try:
+            return self.model.generate(
+                prompt=user_input,
+                system_prompt=SYSTEM_PROMPT,
+                conversation_history=context,
+                deadline=deadline,
+                on_token=on_token,
+            )
+        except Exception as e:
+            return self._generation_failed(e)
+    
+    def _generation_failed(self, e: Exception) -> Dict:
+        """Log a generation failure and return the error response."""
+        if isinstance(e, CircuitOpenError):
+            # Circuit is open: failed fast without calling the model
+            logger.warning("Model generation skipped: %s", e)
+        else:
+            logger.error("Model generation failed: %s", e)
+        return self._error_response(e)
+    
+    @staticmethod
+    def _error_response(error: Exception) -> Dict:
+        """Model response used when generation fails."""
+        return {
+            "response": ERROR_RESPONSE,
+            "error": str(error),
+            "model": "error",
+            "deterministic": False,
+        }
     
     def _moderate_output(
         self,
@@ -287,17 +590,11 @@ class ChatEngine:
         - Check and handle conversation limits
         - Maintain maximum history size
         """
-        # Add user message
-        self.conversation_history.append({
-            "role": "user",
-            "content": user_input,
-        })
-        
-        # Add assistant response
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": assistant_response,
-        })
+        # Add user message and assistant response
+        new_turns = [
+            self.conversation_history.append(Role.USER, user_input),
+            self.conversation_history.append(Role.ASSISTANT, assistant_response),
+        ]
         
         # Increment turn counter
         self.turn_count += 1
@@ -305,29 +602,55 @@ class ChatEngine:
         # TODO: Check for conversation length limits
         # When MAX_CONVERSATION_TURNS is reached, add a system message to history
         if self.turn_count >= MAX_CONVERSATION_TURNS:
-            self.conversation_history.append({
-                "role": "system",
-                "content": "Conversation limit reached. Please start a new conversation."
-            })
-
-        # Optional: Trim history if it exceeds window size (already implemented)
-        max_history_size = CONTEXT_WINDOW_SIZE * 2  # Each turn has 2 messages
-        if len(self.conversation_history) > max_history_size:
-            # Keep the most recent messages
-            self.conversation_history = self.conversation_history[-max_history_size:]
+            new_turns.append(self.conversation_history.append(
+                Role.SYSTEM,
+                "Conversation limit reached. Please start a new conversation.",
+            ))
+
+        if self.store is not None:
+            # Queued for the background writer; never blocks the turn
+            self.store.append(
+                self.session_id, [turn.to_dict() for turn in new_turns], self.turn_count
+            )
     
     def reset(self):
         """Reset conversation state."""
-        self.conversation_history = []
-        self.turn_count = 0
-        self.first_interaction = True
-        self.session_id = f"session_{int(time.time())}"
-        logger.info(f"Chat engine reset. New session: {self.session_id}")
+        with self._state_lock:
+            self.conversation_history.clear()
+            self.turn_count = 0
+            self.first_interaction = True
+            self.session_id = new_session_id()
+            self._rehydrated = True
+        logger.info("Chat engine reset. New session: %s", self.session_id)
+
+
+def get_semantic_cache_stats() -> Dict:
+    """Get semantic cache counters, or whether it is disabled."""
+    if not get_moderator().embeddings:
+        return {"enabled": False}
+    return {"enabled": True, **get_semantic_cache().stats()}
+
+
+def get_routing_stats() -> Dict:
+    """Get counters of fast/primary model routing."""
+    return get_router().stats()
+
+
+def get_coalescing_stats() -> Dict:
+    """Get counters of coalesced generation requests."""
+    return _generation_flight.stats()
 
 
 # Singleton instance
 _engine_instance = None
 
+# Engines of client-identified sessions, least recently used first
+_session_engines: "OrderedDict[str, ChatEngine]" = OrderedDict()
+_session_engines_lock = threading.Lock()
+
+# Engines owned by open connections (WebSockets), outside the session cache
+_connection_engines: set = set()
+
 
 def get_engine() -> ChatEngine:
     """Get or create singleton chat engine instance."""
@@ -335,4 +658,84 @@ def get_engine() -> ChatEngine:
     if _engine_instance is None:
         _engine_instance = ChatEngine()
         logger.info("Created new ChatEngine singleton instance")
-    return _engine_instance
\ No newline at end of file
+    return _engine_instance
+
+
+def get_session_engine(session_id: Optional[str] = None, turn_count: Optional[int] = None) -> ChatEngine:
+    """
+    Get the chat engine of a client-identified session.
+    
+    Engines are cached per worker; an evicted or unknown session gets a new
+    engine that rehydrates from the session store on its next message.
+    
+    Args:
+        session_id: Session identifier previously returned to the client,
+            or None to start a new session
+        turn_count: Turn count of the last response the client received;
+            a cached engine behind it reloads the session from the store
+        
+    Raises:
+        ValueError: If session_id is not a valid session identifier
+    """
+    if session_id is not None and not is_valid_session_id(session_id):
+        raise ValueError(f"Invalid session id: {session_id}")
+    with _session_engines_lock:
+        engine = _session_engines.get(session_id) if session_id else None
+        if engine is not None:
+            _session_engines.move_to_end(session_id)
+            if turn_count is not None:
+                engine.expect_turn_count(turn_count)
+            return engine
+        engine = ChatEngine(session_id=session_id)
+        _session_engines[engine.session_id] = engine
+        while len(_session_engines) > SESSION_CACHE_SIZE:
+            _session_engines.popitem(last=False)
+        return engine
+
+
+def release_session_engine(session_id: str):
+    """Drop a session's engine from memory; its persisted turns are kept."""
+    with _session_engines_lock:
+        _session_engines.pop(session_id, None)
+
+
+def register_connection_engine(engine: ChatEngine):
+    """Track an engine owned by a connection so its memory is reported."""
+    with _session_engines_lock:
+        _connection_engines.add(engine)
+
+
+def unregister_connection_engine(engine: ChatEngine):
+    """Stop tracking a connection's engine once the connection closes."""
+    with _session_engines_lock:
+        _connection_engines.discard(engine)
+
+
+def get_session_memory() -> Dict:
+    """
+    Count in-memory sessions and the history they hold.
+    
+    Returns:
+        Engines (the default and connection-owned engines included), history
+        turns and the approximate bytes of those histories
+    """
+    with _session_engines_lock:
+        engines = list(_session_engines.values())
+        connection_engines = len(_connection_engines)
+        engines.extend(_connection_engines)
+    if _engine_instance is not None:
+        engines.append(_engine_instance)
+    return {
+        "engines": len(engines),
+        "connection_engines": connection_engines,
+        "history_turns": sum(len(engine.conversation_history) for engine in engines),
+        "history_bytes": sum(engine.conversation_history.size_bytes() for engine in engines),
+    }
+
+
+def get_session_stats() -> Dict:
+    """Get counters of cached and persisted sessions."""
+    stats = {"cached_sessions": len(_session_engines)}
+    if SESSION_PERSISTENCE:
+        stats["store"] = get_session_store().stats()
+    return stats
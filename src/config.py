@@ -84,6 +84,184 @@ CUSTOM_CONFIG = {
     "response_style": "supportive",
 }
 
+# ============================================================================
+# Runtime Settings
+# ============================================================================
+
+# Hugging Face model name or local path used by the moderator (loaded lazily)
+MODERATION_MODEL_NAME = os.getenv("CS3249_MODERATION_MODEL", "distilbert-base-uncased")
+
+# Moderation classifier runtime: "torch" (eager PyTorch) or "onnx"
+# (exported graph, see scripts/export_moderator.py)
+MODERATION_BACKEND: Literal["torch", "onnx"] = os.getenv("CS3249_MODERATION_BACKEND", "torch")
+MODERATION_ONNX_DIR = os.path.join(BASE_DIR, "models", "moderator")
+MODERATION_ONNX_FILE = os.getenv("CS3249_MODERATION_ONNX_FILE", "model.onnx")
+
+# Unix socket of a shared moderation service (python -m src.moderation_service);
+# when unset each worker loads its own moderation model
+MODERATION_SOCKET = os.getenv("CS3249_MODERATION_SOCKET")
+# Owner-only directory for the service's default socket and its key file. Both
+# ends authenticate with the key (0600, created by the service) before any
+# message is exchanged.
+MODERATION_RUN_DIR = os.getenv("CS3249_MODERATION_RUN_DIR", os.path.join(BASE_DIR, "data", "run"))
+MODERATION_DEFAULT_SOCKET = os.path.join(MODERATION_RUN_DIR, "moderation.sock")
+MODERATION_AUTHKEY_FILE = os.getenv(
+    "CS3249_MODERATION_AUTHKEY_FILE", os.path.join(MODERATION_RUN_DIR, "moderation.key")
+)
+
+# Cross-request batching in the moderation service
+MODERATION_BATCH_SIZE = 32
+MODERATION_BATCH_WAIT_MS = 5
+
+# How long Ollama keeps the model resident after a request (Ollama duration string)
+MODEL_KEEP_ALIVE = os.getenv("CS3249_MODEL_KEEP_ALIVE", "30m")
+
+# Load and warm up models in a background thread when the backend starts
+WARM_UP_ON_STARTUP = os.getenv("CS3249_WARM_UP", "1") != "0"
+
+# Ollama endpoints to route generation across (comma-separated override)
+MODEL_ENDPOINTS = [
+    url.strip().rstrip("/")
+    for url in os.getenv("CS3249_MODEL_ENDPOINTS", MODEL_ENDPOINT).split(",")
+    if url.strip()
+]
+
+# Concurrent model requests per worker; also sizes HTTP connection pools
+MAX_CONCURRENT_REQUESTS = int(os.getenv("CS3249_MAX_CONCURRENT_REQUESTS", "8"))
+
+# Temporarily stop routing to an endpoint after consecutive failures
+ENDPOINT_EJECT_AFTER_FAILURES = 3
+ENDPOINT_EJECT_SECONDS = 30
+
+# Requests allowed to wait for a generation slot before new ones get HTTP 429
+ADMISSION_QUEUE_SIZE = int(os.getenv("CS3249_ADMISSION_QUEUE_SIZE", "16"))
+
+# Token-bucket rate limits per client address and per session (sustained
+# requests per second and burst); a rate of 0 disables that limit. Exceeding
+# either returns HTTP 429 with Retry-After.
+RATE_LIMIT_CLIENT_RPS = float(os.getenv("CS3249_RATE_LIMIT_CLIENT_RPS", "5"))
+RATE_LIMIT_CLIENT_BURST = int(os.getenv("CS3249_RATE_LIMIT_CLIENT_BURST", "50"))
+RATE_LIMIT_SESSION_RPS = float(os.getenv("CS3249_RATE_LIMIT_SESSION_RPS", "0.5"))
+RATE_LIMIT_SESSION_BURST = int(os.getenv("CS3249_RATE_LIMIT_SESSION_BURST", "5"))
+RATE_LIMIT_MAX_KEYS = 100000  # Tracked buckets per limit; least recently used evicted
+# Peers whose X-Forwarded-For is trusted: requests from these addresses are
+# keyed by the nearest forwarded address that is not itself a trusted proxy.
+# Defaults to loopback, where the Streamlit frontend forwards each browser's
+# address; other peers' X-Forwarded-For is ignored.
+RATE_LIMIT_TRUSTED_PROXIES = frozenset(
+    address.strip()
+    for address in os.getenv("CS3249_RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1").split(",")
+    if address.strip()
+)
+
+# /chat/batch: model calls in flight per batch and maximum items per request
+BATCH_MAX_CONCURRENCY = 4
+BATCH_MAX_ITEMS = 50000
+
+# End-to-end budget for a /chat request (below the frontend's 60 s timeout)
+REQUEST_DEADLINE_SECONDS = 55
+
+# Model call retries, attempted only while the request deadline allows
+MODEL_MAX_ATTEMPTS = 3
+MODEL_RETRY_BACKOFF_SECONDS = 1.0
+
+# Circuit breaker: fail fast when the recent model error rate is too high
+CIRCUIT_FAILURE_RATE = 0.5
+CIRCUIT_WINDOW_SIZE = 20
+CIRCUIT_MIN_REQUESTS = 5
+CIRCUIT_OPEN_SECONDS = 30
+
+# Share one model call among identical concurrent deterministic requests
+COALESCE_IDENTICAL_REQUESTS = True
+
+# Persist conversations to a local SQLite turn log so sessions survive restarts.
+# Off by default: turns are stored as plaintext, so enabling it is an explicit
+# decision about keeping users' messages on disk.
+SESSION_PERSISTENCE = os.getenv("CS3249_SESSION_PERSISTENCE", "0") == "1"
+SESSION_DB_PATH = os.getenv("CS3249_SESSION_DB", os.path.join(BASE_DIR, "data", "sessions.db"))
+SESSION_WRITE_BATCH_SIZE = 256  # Queued writes committed per transaction
+SESSION_FLUSH_INTERVAL_MS = 50  # Writer waits this long to fill a batch
+SESSION_WRITE_RETRIES = 3  # Retries of a failed write before it is dropped
+SESSION_LOAD_FLUSH_SECONDS = 2.0  # Wait for this worker's queued writes before reading a session
+SESSION_RETENTION_SECONDS = float(os.getenv("CS3249_SESSION_RETENTION_SECONDS", str(7 * 24 * 3600)))  # Idle sessions purged after this
+SESSION_PURGE_INTERVAL_SECONDS = 3600
+SESSION_CACHE_SIZE = 1000  # Sessions kept in memory per worker (least recently used evicted)
+
+# Logging: JSON lines instead of LOG_FORMAT text, written by a background thread
+LOG_JSON = os.getenv("CS3249_LOG_JSON", "0") == "1"
+LOG_ASYNC = os.getenv("CS3249_LOG_ASYNC", "1") != "0"
+
+# Fraction of INFO/WARNING records kept per logger, e.g. "src.moderation=0.1,src.chat_engine=0.5"
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, _, rate in (
+        entry.partition("=") for entry in os.getenv("CS3249_LOG_SAMPLE", "").split(",") if entry.strip()
+    )
+}
+
+# Evaluation runs saved by scripts/evaluate.py --run-store (compared with scripts/diff_runs.py)
+RUNS_DIR = os.path.join(TESTS_DIR, "runs")
+
+# Allowed relative regression per metric for scripts/evaluate.py --baseline
+PERF_TOLERANCES = {
+    "latency_p50_ms": 0.25,
+    "latency_p95_ms": 0.5,
+    "moderation_ms_per_call": 0.5,
+    "tokens_per_second": 0.2,  # Higher is better: fails if 20% slower
+}
+
+# Tiered routing: short turns the moderator considers low-risk go to a smaller,
+# faster model; everything else (and any fast-model failure) uses MODEL_NAME.
+# Disabled when FAST_MODEL_NAME is empty.
+FAST_MODEL_NAME = os.getenv("CS3249_FAST_MODEL", "")  # e.g. "qwen2.5:0.5b"
+FAST_MODEL_OPTIONS = {"num_predict": 200}  # Overrides of the get_model_config() options
+ROUTING_MAX_PROMPT_CHARS = 160  # Longer user messages always use the primary model
+# Fast-model routing margin. Risk is how far the predicted class's probability
+# has moved from the uniform floor (1/3 with three classes; risk 0.0) towards
+# its SAFETY_MODE threshold (risk 1.0, where the moderator acts). 0.5 routes a
+# turn only while it is less than halfway there, e.g. in strict mode a
+# medical-leaning turn below p=0.37 or a harmful-leaning one below p=0.42.
+# Crisis-leaning turns never route in strict mode (threshold 0.3 < 1/3).
+ROUTING_MAX_RISK = float(os.getenv("CS3249_ROUTING_MAX_RISK", "0.5"))
+
+# Semantic cache of allowed first-turn responses, keyed by the moderator's
+# pooled DistilBERT embeddings (torch moderation backend only)
+SEMANTIC_CACHE_ENABLED = os.getenv("CS3249_SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_SIZE = 2048  # Cached responses; least recently used replaced
+# Minimum cosine similarity for a paraphrase hit. Unset by default, so only
+# messages with the same normalized text hit: mean-pooled DistilBERT
+# embeddings are anisotropic and unrelated (even opposite) sentences often
+# score above 0.9. Only set this from a calibration on labelled paraphrase /
+# non-paraphrase pairs embedded by the deployed moderation model, choosing
+# the lowest value with no false matches among pairs sharing an outcome.
+_semantic_cache_threshold = os.getenv("CS3249_SEMANTIC_CACHE_THRESHOLD")
+SEMANTIC_CACHE_THRESHOLD = float(_semantic_cache_threshold) if _semantic_cache_threshold else None
+
+# Graceful drain: on SIGTERM (or POST /admin/drain) readiness fails and new chat
+# work gets HTTP 503 while in-flight generations get up to DRAIN_TIMEOUT_SECONDS
+# to finish; the listener stays open for DRAIN_GRACE_SECONDS after SIGTERM so
+# load balancers see the failing readiness first
+DRAIN_GRACE_SECONDS = float(os.getenv("CS3249_DRAIN_GRACE_SECONDS", "5"))
+DRAIN_TIMEOUT_SECONDS = float(os.getenv("CS3249_DRAIN_TIMEOUT_SECONDS", "60"))
+
+# Token required in X-Admin-Token by /admin/* endpoints and X-Profile; admin
+# endpoints are disabled when unset
+ADMIN_TOKEN = os.getenv("CS3249_ADMIN_TOKEN")
+
+# Stack-sampling profiler (/admin/profile and the X-Profile header)
+PROFILE_INTERVAL_MS = 5
+PROFILE_MAX_SECONDS = 60
+
+# Memory introspection (/admin/memory): trace Python allocations from startup
+# so growth is attributed from the beginning; otherwise tracing starts on the
+# first /admin/memory call. Tracing costs CPU and memory on every allocation.
+MEMORY_TRACE_ON_START = os.getenv("CS3249_TRACEMALLOC", "0") == "1"
+MEMORY_TRACE_FRAMES = 1  # Stack frames stored per allocation
+
+# Periodically re-preload the model so Ollama never evicts it during business hours
+KEEP_WARM_INTERVAL_SECONDS = 240
+KEEP_WARM_HOURS = (8, 22)  # Local hours [start, end) in which to keep the model warm
+
 # ============================================================================
 # Computed Settings (DO NOT MODIFY)
 # ============================================================================
@@ -111,6 +289,13 @@ def validate_config():
     assert 1 <= MAX_CONVERSATION_TURNS <= 50, (
         f"Invalid MAX_CONVERSATION_TURNS: {MAX_CONVERSATION_TURNS}"
     )
+    assert MODERATION_BACKEND in ["torch", "onnx"], (
+        f"Invalid MODERATION_BACKEND: {MODERATION_BACKEND}"
+    )
+    assert MODEL_ENDPOINTS, "MODEL_ENDPOINTS must not be empty"
+    assert MAX_CONCURRENT_REQUESTS >= 1, (
+        f"Invalid MAX_CONCURRENT_REQUESTS: {MAX_CONCURRENT_REQUESTS}"
+    )
 
 
 # Run validation on import
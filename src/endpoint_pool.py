@@ -0,0 +1,142 @@
+"""
+Pool of Ollama endpoints with least-loaded routing.
+
+Tracks in-flight requests and recent latency per endpoint, routes each
+request to the least-loaded healthy endpoint and temporarily ejects
+endpoints that keep failing.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+from .config import ENDPOINT_EJECT_AFTER_FAILURES, ENDPOINT_EJECT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """Routing state of a single Ollama endpoint."""
+
+    def __init__(self, url: str):
+        """Initialize endpoint state."""
+        self.url = url
+        self.in_flight = 0
+        self.latency_ewma_ms = 0.0  # Exponentially weighted recent latency
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0  # time.monotonic() until which the endpoint is skipped
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def is_healthy(self, now: float) -> bool:
+        """Whether the endpoint is currently eligible for routing."""
+        return self.ejected_until <= now
+
+    def to_dict(self, now: float) -> Dict:
+        """Return endpoint state as a JSON-serializable dictionary."""
+        return {
+            "url": self.url,
+            "healthy": self.is_healthy(now),
+            "in_flight": self.in_flight,
+            "latency_ewma_ms": round(self.latency_ewma_ms, 1),
+            "consecutive_failures": self.consecutive_failures,
+            "ejected_for_s": round(max(0.0, self.ejected_until - now), 1),
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures,
+        }
+
+
+class EndpointPool:
+    """Least-loaded router over a set of endpoints."""
+
+    def __init__(
+        self,
+        urls: List[str],
+        eject_after_failures: int = ENDPOINT_EJECT_AFTER_FAILURES,
+        eject_seconds: float = ENDPOINT_EJECT_SECONDS,
+        latency_alpha: float = 0.2,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            urls: Endpoint base URLs
+            eject_after_failures: Consecutive failures before ejecting an endpoint
+            eject_seconds: How long an ejected endpoint is skipped
+            latency_alpha: Weight of the newest sample in the latency average
+        """
+        if not urls:
+            raise ValueError("EndpointPool requires at least one endpoint")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+        self.latency_alpha = latency_alpha
+        self._lock = threading.Lock()
+
+    def _choose(self, now: float) -> Endpoint:
+        healthy = [e for e in self.endpoints if e.is_healthy(now)]
+        if not healthy:
+            # Every endpoint is ejected: try the one closest to being readmitted
+            return min(self.endpoints, key=lambda e: e.ejected_until)
+        return min(healthy, key=lambda e: (e.in_flight, e.latency_ewma_ms))
+
+    @contextmanager
+    def acquire(self) -> Iterator[Endpoint]:
+        """
+        Reserve the least-loaded healthy endpoint for one request.
+
+        Yields:
+            The chosen endpoint; its in-flight count is held until exit
+        """
+        with self._lock:
+            endpoint = self._choose(time.monotonic())
+            endpoint.in_flight += 1
+            endpoint.total_requests += 1
+        try:
+            yield endpoint
+        finally:
+            with self._lock:
+                endpoint.in_flight -= 1
+
+    def record_success(self, endpoint: Endpoint, latency_ms: float):
+        """Record a successful request and update the latency average."""
+        with self._lock:
+            endpoint.consecutive_failures = 0
+            if endpoint.latency_ewma_ms == 0.0:
+                endpoint.latency_ewma_ms = latency_ms
+            else:
+                endpoint.latency_ewma_ms += self.latency_alpha * (
+                    latency_ms - endpoint.latency_ewma_ms
+                )
+
+    def record_failure(self, endpoint: Endpoint):
+        """Record a failed request, ejecting the endpoint if it keeps failing."""
+        with self._lock:
+            endpoint.consecutive_failures += 1
+            endpoint.total_failures += 1
+            if endpoint.consecutive_failures >= self.eject_after_failures:
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                endpoint.consecutive_failures = 0
+                logger.warning(
+                    f"Ejecting endpoint {endpoint.url} for {self.eject_seconds}s "
+                    f"after {self.eject_after_failures} consecutive failures"
+                )
+
+    def healthy_endpoints(self) -> List[Endpoint]:
+        """Return the endpoints currently eligible for routing."""
+        now = time.monotonic()
+        with self._lock:
+            return [e for e in self.endpoints if e.is_healthy(now)]
+
+    def eject(self, endpoint: Endpoint):
+        """Eject an endpoint immediately (e.g. failed connection check)."""
+        with self._lock:
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+
+    def stats(self) -> List[Dict]:
+        """Return the state of every endpoint."""
+        now = time.monotonic()
+        with self._lock:
+            return [e.to_dict(now) for e in self.endpoints]
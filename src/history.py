@@ -0,0 +1,116 @@
+"""
+Compact conversation history.
+
+Turns are slotted records whose role is a shared enum member, held in a
+fixed-capacity ring buffer so appending a turn evicts the oldest in O(1)
+instead of re-slicing the whole history.
+"""
+
+import sys
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List
+
+
+class Role(str, Enum):
+    """Speaker of a conversation turn."""
+
+    USER = "user"
+    ASSISTANT = "assistant"
+    SYSTEM = "system"
+
+
+class Turn:
+    """One message of a conversation."""
+
+    __slots__ = ("role", "content", "rendered")
+
+    def __init__(self, role: Role, content: str):
+        self.role = role
+        self.content = content
+        self.rendered = None  # prompt line, cached by the model provider
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access, so turns can be read like the former history dicts."""
+        if key == "role":
+            return self.role.value
+        if key == "content":
+            return self.content
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in ("role", "content"):
+            raise KeyError(key)
+        return self.get(key)
+
+    def to_dict(self) -> Dict[str, str]:
+        """Return the turn as a JSON-serializable dictionary."""
+        return {"role": self.role.value, "content": self.content}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Turn):
+            return NotImplemented
+        return self.role is other.role and self.content == other.content
+
+    def __repr__(self) -> str:
+        return f"Turn({self.role.value!r}, {self.content!r})"
+
+
+class ConversationHistory:
+    """Ring buffer of the most recent turns of a conversation."""
+
+    __slots__ = ("max_turns", "_turns", "_start")
+
+    def __init__(self, max_turns: int):
+        """
+        Initialize an empty history.
+
+        Args:
+            max_turns: Turns kept; appending beyond this evicts the oldest
+        """
+        self.max_turns = max_turns
+        self._turns: List[Turn] = []  # grows to max_turns, then overwritten in place
+        self._start = 0  # index of the oldest turn once full
+
+    def append(self, role: Role, content: str) -> Turn:
+        """Add a turn, evicting the oldest if full, and return it."""
+        turn = Turn(role, content)
+        if len(self._turns) < self.max_turns:
+            self._turns.append(turn)
+        else:
+            self._turns[self._start] = turn
+            self._start = (self._start + 1) % self.max_turns
+        return turn
+
+    def load(self, turns: Iterable[Dict]):
+        """Replace the history with turns given as role/content dicts."""
+        self.clear()
+        for turn in turns:
+            self.append(Role(turn["role"]), turn["content"])
+
+    def recent(self, n: int) -> List[Turn]:
+        """Return up to the last n turns, oldest first."""
+        ordered = self._turns[self._start:] + self._turns[:self._start]
+        return ordered[-n:] if n < len(ordered) else ordered
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by the history, including turn strings."""
+        size = sys.getsizeof(self) + sys.getsizeof(self._turns)
+        for turn in self._turns:
+            size += sys.getsizeof(turn) + sys.getsizeof(turn.content)
+            if turn.rendered is not None:
+                size += sys.getsizeof(turn.rendered)
+        return size
+
+    def clear(self):
+        """Remove all turns."""
+        self._turns = []
+        self._start = 0
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def __bool__(self) -> bool:
+        return bool(self._turns)
+
+    def __iter__(self) -> Iterator[Turn]:
+        return iter(self.recent(self.max_turns))
@@ -65,6 +65,54 @@ def write_jsonl(records: List[Dict], filepath: str):
     logger.info(f"Wrote {len(records)} records to {filepath}")
 
 
+def to_output_record(record_id: str, prompt: str, result: Dict) -> Dict:
+    """
+    Format a chat engine result as an evaluation output record.
+    
+    Args:
+        record_id: Test case / item identifier
+        prompt: Original user input
+        result: Result of ChatEngine.process_message
+        
+    Returns:
+        Record matching tests/expected_schema.json
+    """
+    return {
+        "id": record_id,
+        "prompt": prompt,
+        "response": result.get("response", ""),
+        "safety_action": result.get("safety_action", "allow"),
+        "policy_tags": result.get("policy_tags", []),
+        "latency_ms": result.get("latency_ms", 0),
+        "model_name": result.get("model_name", "unknown"),
+        "deterministic": result.get("deterministic", True),
+    }
+
+
+def error_output_record(record_id: str, prompt: str, error: Exception) -> Dict:
+    """
+    Format a processing failure as an evaluation output record.
+    
+    Args:
+        record_id: Test case / item identifier
+        prompt: Original user input
+        error: Exception that was raised
+        
+    Returns:
+        Record matching tests/expected_schema.json
+    """
+    return {
+        "id": record_id,
+        "prompt": prompt,
+        "response": f"ERROR: {str(error)}",
+        "safety_action": "error",
+        "policy_tags": ["error"],
+        "latency_ms": 0,
+        "model_name": "unknown",
+        "deterministic": False,
+    }
+
+
 def load_schema(schema_path: str) -> Dict:
     """
     Load JSON schema from file.
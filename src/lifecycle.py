@@ -0,0 +1,167 @@
+"""
+Graceful drain of the backend before shutdown.
+
+Entry points register each unit of chat work (a /chat request, a streamed
+reply, a batch, a WebSocket message) while it runs. Once draining starts,
+readiness fails so a load balancer shifts traffic away, new work is
+rejected, and shutdown waits for the registered work to finish before the
+session store and log queue are flushed.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .config import DRAIN_GRACE_SECONDS, DRAIN_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Draining(RuntimeError):
+    """Raised when new work arrives while the server is draining."""
+
+    def __init__(self, message: str = "Server is shutting down", retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DrainController:
+    """Counts in-flight work and blocks new work once draining."""
+
+    def __init__(self):
+        """Initialize in the accepting state."""
+        self._in_flight = 0
+        self._draining_since: Optional[float] = None
+        self._idle = threading.Condition()
+        self.rejected = 0
+
+    @property
+    def draining(self) -> bool:
+        """Whether draining has started."""
+        return self._draining_since is not None
+
+    def begin(self):
+        """
+        Register a unit of work; pair with end().
+
+        Raises:
+            Draining: If draining has started
+        """
+        with self._idle:
+            if self._draining_since is not None:
+                self.rejected += 1
+                raise Draining()
+            self._in_flight += 1
+
+    def end(self):
+        """Mark a unit of work registered with begin() as finished."""
+        with self._idle:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """
+        Register work for the duration of a with block.
+
+        Raises:
+            Draining: If draining has started
+        """
+        self.begin()
+        try:
+            yield
+        finally:
+            self.end()
+
+    def start_drain(self):
+        """Stop accepting new work; in-flight work continues."""
+        with self._idle:
+            if self._draining_since is None:
+                self._draining_since = time.monotonic()
+                logger.info("Draining: rejecting new work, %d in flight", self._in_flight)
+
+    def wait_idle(self, timeout: float) -> bool:
+        """
+        Wait for in-flight work to finish.
+
+        Returns:
+            True if nothing is in flight, False if the timeout expired first
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+    def drain(self, timeout: float = DRAIN_TIMEOUT_SECONDS) -> bool:
+        """
+        Stop accepting new work and wait for in-flight work to finish.
+
+        Args:
+            timeout: Longest time to wait
+
+        Returns:
+            True if all work finished within the timeout
+        """
+        self.start_drain()
+        start = time.monotonic()
+        finished = self.wait_idle(timeout)
+        if finished:
+            logger.info("Drained in %.1fs", time.monotonic() - start)
+        else:
+            logger.warning("Drain timed out after %.1fs with %d in flight", timeout, self._in_flight)
+        return finished
+
+    def status(self) -> Dict:
+        """Return draining state and counters."""
+        with self._idle:
+            return {
+                "draining": self._draining_since is not None,
+                "draining_for_s": (
+                    round(time.monotonic() - self._draining_since, 1)
+                    if self._draining_since is not None else None
+                ),
+                "in_flight": self._in_flight,
+                "rejected": self.rejected,
+            }
+
+
+# Singleton instance
+_drain_instance = None
+
+
+def get_drain_controller() -> DrainController:
+    """Get or create singleton drain controller."""
+    global _drain_instance
+    if _drain_instance is None:
+        _drain_instance = DrainController()
+    return _drain_instance
+
+
+def serve(app, host: str, port: int, grace_seconds: float = DRAIN_GRACE_SECONDS):
+    """
+    Run app under uvicorn, draining on the first SIGINT/SIGTERM.
+
+    The first signal starts draining and keeps the listener open for
+    grace_seconds, so health checks can observe the failing readiness
+    before connections are refused. Shutdown then proceeds normally; a
+    second signal exits without waiting.
+    """
+    import uvicorn
+
+    class DrainingServer(uvicorn.Server):
+        def handle_exit(self, sig, frame):
+            drain = get_drain_controller()
+            if drain.draining:
+                # Second signal: do not wait any longer
+                super().handle_exit(sig, frame)
+                return
+            drain.start_drain()
+            timer = threading.Timer(grace_seconds, uvicorn.Server.handle_exit, (self, sig, frame))
+            timer.daemon = True
+            timer.start()
+
+    config = uvicorn.Config(
+        app, host=host, port=port, timeout_graceful_shutdown=int(DRAIN_TIMEOUT_SECONDS)
+    )
+    DrainingServer(config).run()
@@ -0,0 +1,189 @@
+"""
+Logging setup for the backend and scripts.
+
+Log records are handed to a queue on the calling thread and formatted and
+written by a background listener thread, so request threads never block on
+log I/O. Records can be rendered as JSON lines, and high-volume loggers can
+be sampled.
+
+Usage:
+    CS3249_LOG_JSON=1 CS3249_LOG_SAMPLE="src.moderation=0.1" python app/backend.py
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO
+
+from .config import LOG_ASYNC, LOG_FORMAT, LOG_JSON, LOG_LEVEL, LOG_SAMPLE_RATES
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the records of selected loggers."""
+
+    def __init__(self, rates: Dict[str, float], max_level: int = logging.WARNING):
+        """
+        Initialize the filter.
+
+        Args:
+            rates: Logger name -> fraction of records kept; applies to the
+                logger and its children (the longest matching name wins)
+            max_level: Records above this level are always kept
+        """
+        super().__init__()
+        self.rates = rates
+        self.max_level = max_level
+        self.dropped = 0
+        self._cache: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the listener thread.
+
+    The standard QueueHandler formats the message on the calling thread;
+    this one enqueues the record as is. Log arguments must therefore not be
+    mutated after the call, which holds for the values logged here.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+# Active listener and sampling filter, if configure_logging() was called
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[DeferredQueueHandler] = None
+_sampler: Optional[SamplingFilter] = None
+_json_logs = False
+_configure_lock = threading.Lock()
+
+
+def configure_logging(
+    level: str = LOG_LEVEL,
+    json_logs: bool = LOG_JSON,
+    async_logs: bool = LOG_ASYNC,
+    sample_rates: Optional[Dict[str, float]] = None,
+    stream: Optional[TextIO] = None,
+):
+    """
+    Configure the root logger; replaces logging.basicConfig.
+
+    Args:
+        level: Root log level
+        json_logs: Write JSON lines instead of LOG_FORMAT text
+        async_logs: Write from a background thread via a queue
+        sample_rates: Logger name -> fraction of records kept
+            (defaults to LOG_SAMPLE_RATES)
+        stream: Where to write (defaults to stderr)
+    """
+    global _listener, _queue_handler, _sampler, _json_logs
+    with _configure_lock:
+        stop_logging()
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if json_logs else logging.Formatter(LOG_FORMAT))
+        _json_logs = json_logs
+
+        handler = output
+        if async_logs:
+            handler = _queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+            _listener = QueueListener(handler.queue, output, respect_handler_level=True)
+            _listener.start()
+
+        rates = LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+        _sampler = SamplingFilter(rates) if rates else None
+        if _sampler is not None:
+            handler.addFilter(_sampler)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level)
+
+
+def stop_logging():
+    """
+    Write out queued records and stop the listener thread.
+
+    The root logger's queue handler is replaced by the listener's output
+    handler first, so records logged afterwards are written directly
+    instead of piling up in a queue nobody drains.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    if _queue_handler in root.handlers:
+        outputs = list(_listener.handlers)
+        if _sampler is not None:
+            for output in outputs:
+                output.addFilter(_sampler)
+        # One assignment, so concurrent emits see either the old or the new list
+        index = root.handlers.index(_queue_handler)
+        root.handlers = root.handlers[:index] + outputs + root.handlers[index + 1:]
+    _listener.stop()
+    _listener = None
+    _queue_handler = None
+
+
+def logging_stats() -> Dict:
+    """Return the logging mode, queued records and sampled-out records."""
+    return {
+        "async": _listener is not None,
+        "queued": _listener.queue.qsize() if _listener is not None else 0,
+        "json": _json_logs,
+        "sampled_out": _sampler.dropped if _sampler is not None else 0,
+    }
+
+
+atexit.register(stop_logging)
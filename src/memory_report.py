@@ -0,0 +1,187 @@
+"""
+Memory introspection for the running backend.
+
+Combines tracemalloc statistics grouped by the module that made each
+allocation with the sizes of the structures that are expected to grow:
+cached session engines and their histories, prompt and logging caches, the
+session write queue and the moderation model's tensors. Each report keeps
+its tracemalloc snapshot, so the next report can show what grew in between
+without attaching a debugger.
+"""
+
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Dict, List, Optional
+
+from .chat_engine import get_coalescing_stats, get_semantic_cache_stats, get_session_memory
+from .config import MEMORY_TRACE_FRAMES, SESSION_PERSISTENCE
+from .logging_utils import logging_stats
+from .model_provider import get_provider
+from .moderation import get_moderator
+from .session_store import get_session_store
+
+logger = logging.getLogger(__name__)
+
+# Allocations made by tracemalloc itself and the import machinery are noise
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def start_tracing(frames: int = MEMORY_TRACE_FRAMES) -> bool:
+    """
+    Start tracing Python allocations if not already tracing.
+
+    Returns:
+        True if tracing was started by this call
+    """
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    logger.info("Started tracemalloc with %d frame(s)", frames)
+    return True
+
+
+def _module_index() -> Dict[str, str]:
+    """Map source file paths of loaded modules to module names."""
+    index = {}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if path:
+            index[os.path.abspath(path)] = name
+    return index
+
+
+def _module_of(filename: str, index: Dict[str, str]) -> str:
+    return index.get(os.path.abspath(filename), filename)
+
+
+def _group_by_module(stats: List, index: Dict[str, str], diff: bool = False) -> Dict[str, Dict]:
+    """Sum per-file tracemalloc statistics into per-module totals."""
+    modules: Dict[str, Dict] = {}
+    for stat in stats:
+        name = _module_of(stat.traceback[0].filename, index)
+        entry = modules.setdefault(name, {"module": name, "bytes": 0, "blocks": 0})
+        entry["bytes"] += stat.size_diff if diff else stat.size
+        entry["blocks"] += stat.count_diff if diff else stat.count
+    return modules
+
+
+def process_memory() -> Dict:
+    """Resident set size of this process, in bytes."""
+    stats = {}
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    stats["rss_bytes" if key == "VmRSS" else "peak_rss_bytes"] = int(value.split()[0]) * 1024
+    except OSError:
+        import resource
+
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        stats["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    return stats
+
+
+class MemoryReporter:
+    """Builds memory reports and remembers the last tracemalloc snapshot."""
+
+    def __init__(self):
+        """Initialize without a previous snapshot."""
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def report(self, top: int = 20, diff: bool = True) -> Dict:
+        """
+        Build a memory report.
+
+        Tracing is started on the first call if it was not enabled at
+        startup, so that call has no allocation data yet.
+
+        Args:
+            top: Number of modules to list
+            diff: Include growth since the previous report
+
+        Returns:
+            Process RSS, top allocating modules, growth since the last
+            report, and session, cache and moderation model sizes
+        """
+        report = {"process": process_memory()}
+        with self._lock:
+            report["tracemalloc"] = self._allocations(top, diff)
+        report["sessions"] = self._sessions()
+        report["caches"] = self._caches()
+        report["moderation_model"] = self._moderation_model()
+        return report
+
+    def reset(self):
+        """Forget the previous snapshot; the next report starts a new diff."""
+        with self._lock:
+            self._snapshot = None
+
+    def _allocations(self, top: int, diff: bool) -> Dict:
+        if start_tracing():
+            return {"tracing": True, "started": True, "top_modules": []}
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        index = _module_index()
+        current, peak = tracemalloc.get_traced_memory()
+        modules = _group_by_module(snapshot.statistics("filename"), index)
+        result = {
+            "tracing": True,
+            "started": False,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+            "top_modules": sorted(modules.values(), key=lambda m: -m["bytes"])[:top],
+        }
+        if diff and self._snapshot is not None:
+            changes = _group_by_module(snapshot.compare_to(self._snapshot, "filename"), index, diff=True)
+            result["growth"] = sorted(
+                (m for m in changes.values() if m["bytes"] > 0), key=lambda m: -m["bytes"]
+            )[:top]
+        self._snapshot = snapshot
+        return result
+
+    @staticmethod
+    def _sessions() -> Dict:
+        return get_session_memory()
+
+    @staticmethod
+    def _caches() -> Dict:
+        caches = {
+            "prompt_prefixes": get_provider().template.cache_size(),
+            "coalescing_in_flight": get_coalescing_stats()["in_flight"],
+            "log_queue": logging_stats()["queued"],
+            "semantic_cache": get_semantic_cache_stats(),
+        }
+        if SESSION_PERSISTENCE:
+            caches["session_write_queue"] = get_session_store().stats()["pending"]
+        return caches
+
+    @staticmethod
+    def _moderation_model() -> Dict:
+        classifier = get_moderator().classifier
+        if not hasattr(classifier, "memory_stats"):
+            return {"backend": type(classifier).__name__}
+        return {"backend": type(classifier).__name__, **classifier.memory_stats()}
+
+
+# Singleton instance
+_reporter_instance = None
+
+
+def get_memory_reporter() -> MemoryReporter:
+    """Get or create singleton memory reporter."""
+    global _reporter_instance
+    if _reporter_instance is None:
+        _reporter_instance = MemoryReporter()
+    return _reporter_instance
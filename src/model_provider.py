@@ -3,54 +3,148 @@ Model provider module for Ollama integration.
 This module is complete - students should NOT modify.
 """
 
+import hashlib
 import json
 import logging
+import threading
 import time
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 
 from .config import (
-    MODEL_ENDPOINT,
+    FAST_MODEL_NAME,
+    FAST_MODEL_OPTIONS,
+    MAX_CONCURRENT_REQUESTS,
+    MODEL_ENDPOINTS,
+    MODEL_KEEP_ALIVE,
+    MODEL_MAX_ATTEMPTS,
     MODEL_NAME,
+    MODEL_RETRY_BACKOFF_SECONDS,
     TIMEOUT_SECONDS,
     get_model_config,
 )
+from .endpoint_pool import EndpointPool
+from .history import Turn
+from .resilience import CircuitBreaker, CircuitOpenError, Deadline
 
 logger = logging.getLogger(__name__)
 
+# HTTP statuses worth retrying on another attempt
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PromptTemplate:
+    """
+    Renders prompts, reusing the parts that do not change between calls.
+    
+    The system-prompt header is rendered once per distinct system prompt,
+    and each history turn is rendered once and cached on its Turn, so a
+    prompt is assembled by joining precomputed strings.
+    """
+    
+    ROLE_PREFIXES = {"user": "User: ", "assistant": "Assistant: "}
+    RESPONSE_SUFFIX = "\n\n### Response ###\nAssistant: "
+    
+    def __init__(self):
+        """Initialize with an empty prefix cache."""
+        self._prefixes: Dict[str, str] = {}
+    
+    def prefix(self, system_prompt: Optional[str]) -> str:
+        """Return the rendered header for a system prompt (cached)."""
+        if not system_prompt:
+            return ""
+        prefix = self._prefixes.get(system_prompt)
+        if prefix is None:
+            prefix = f"### System Instructions ###\n{system_prompt}\n\n### Conversation ###\n\n"
+            self._prefixes[system_prompt] = prefix
+        return prefix
+    
+    def cache_size(self) -> int:
+        """Number of cached system-prompt headers."""
+        return len(self._prefixes)
+    
+    def render_turn(self, turn) -> str:
+        """
+        Return a history turn's prompt line ("" for turns not shown to the model).
+        
+        Lines of Turn records are cached on the turn.
+        """
+        line = getattr(turn, "rendered", None)
+        if line is None:
+            role_prefix = self.ROLE_PREFIXES.get(turn.get("role", "user"))
+            line = f"{role_prefix}{turn.get('content', '')}\n" if role_prefix else ""
+            if isinstance(turn, Turn):
+                turn.rendered = line
+        return line
+    
+    def render(
+        self,
+        user_prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
+    ) -> str:
+        """Render the full prompt for the model."""
+        parts = [self.prefix(system_prompt)]
+        if conversation_history:
+            parts.extend(self.render_turn(turn) for turn in conversation_history)
+            parts.append("\n")  # Empty line before current prompt
+        parts.append("User: ")
+        parts.append(user_prompt)
+        parts.append(self.RESPONSE_SUFFIX)
+        return "".join(parts)
+
 
 class ModelProvider:
     """Handles communication with Ollama API."""
     
     def __init__(self):
-        """Initialize the model provider with retry logic."""
-        self.endpoint = MODEL_ENDPOINT
+        """
+        Initialize the model provider with routing and circuit breaking.
+
+        No network calls are made here; call warm_up() to verify the
+        connection and preload the model.
+        """
+        self.endpoints = EndpointPool(MODEL_ENDPOINTS)
+        self.endpoint = MODEL_ENDPOINTS[0]  # Primary endpoint
         self.model_name = MODEL_NAME
         self.session = self._create_session()
-        self._verify_connection()
+        self.template = PromptTemplate()
+        self._model_config = get_model_config()
+        # Options of every model requests may be sent to, primary first
+        self.models: Dict[str, Dict] = {self.model_name: self._model_config["options"]}
+        if FAST_MODEL_NAME and FAST_MODEL_NAME != self.model_name:
+            self.models[FAST_MODEL_NAME] = {**self._model_config["options"], **FAST_MODEL_OPTIONS}
+        # One breaker per model, so a failing fast model cannot open the
+        # circuit for the primary model
+        self.breakers: Dict[str, CircuitBreaker] = {model: CircuitBreaker() for model in self.models}
+        self._generation_lock = threading.Lock()
+        self._generated = {"requests": 0, "eval_tokens": 0, "eval_ns": 0, "prompt_tokens": 0}
     
     def _create_session(self) -> requests.Session:
-        """Create HTTP session with retry logic."""
+        """
+        Create HTTP session with pools sized for concurrency.
+        
+        Transport-level retries are disabled; generate() retries itself so
+        that attempts respect the request deadline.
+        """
         session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+        adapter = HTTPAdapter(
+            pool_connections=len(MODEL_ENDPOINTS),
+            pool_maxsize=MAX_CONCURRENT_REQUESTS,
+            max_retries=0,
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         return session
     
-    def _verify_connection(self):
-        """Verify Ollama is running and model is available."""
+    def _verify_connection(self, endpoint: str):
+        """Verify Ollama is running at an endpoint and model is available."""
         try:
             # Check Ollama is running
             response = self.session.get(
-                f"{self.endpoint}/api/tags",
+                f"{endpoint}/api/tags",
                 timeout=5
             )
             response.raise_for_status()
@@ -66,12 +160,16 @@ class ModelProvider:
                     f"Available models: {available}. "
                     f"Run: ollama pull {self.model_name}"
                 )
+            for model in list(self.models)[1:]:
+                if model not in model_names:
+                    # Routed requests fail over to the primary model
+                    logger.warning("Model '%s' not found at %s. Run: ollama pull %s", model, endpoint, model)
             
-            logger.info(f"Successfully connected to Ollama with model {self.model_name}")
+            logger.info(f"Successfully connected to Ollama at {endpoint} with model {self.model_name}")
             
         except requests.exceptions.ConnectionError:
             raise RuntimeError(
-                "Cannot connect to Ollama. Please ensure:\n"
+                f"Cannot connect to Ollama at {endpoint}. Please ensure:\n"
                 "1. Ollama is installed\n"
                 "2. Ollama service is running (run: ollama serve)\n"
                 "3. Port 11434 is not blocked"
@@ -79,76 +177,391 @@ class ModelProvider:
         except Exception as e:
             raise RuntimeError(f"Failed to verify Ollama connection: {e}")
     
-    def generate(
+    def warm_up(self):
+        """
+        Verify every endpoint and preload the model on the reachable ones.
+        
+        Endpoints that fail verification are ejected from routing.
+        
+        Raises:
+            RuntimeError: If no endpoint could be verified
+        """
+        errors = []
+        for endpoint in self.endpoints.endpoints:
+            try:
+                self._verify_connection(endpoint.url)
+            except RuntimeError as e:
+                logger.error(str(e))
+                errors.append(str(e))
+                self.endpoints.eject(endpoint)
+        if len(errors) == len(self.endpoints.endpoints):
+            raise RuntimeError("; ".join(errors))
+        self.preload()
+    
+    def preload(self):
+        """
+        Load the model into Ollama memory and reset its keep-alive timer.
+        
+        A generate request without a prompt makes Ollama load the model and
+        keep it resident for MODEL_KEEP_ALIVE. Every healthy endpoint is
+        preloaded.
+        
+        Raises:
+            RuntimeError: If the model could not be preloaded anywhere
+        """
+        endpoints = self.endpoints.healthy_endpoints()
+        errors = []
+        for endpoint in endpoints:
+            try:
+                response = self.session.post(
+                    f"{endpoint.url}/api/generate",
+                    json={"model": self.model_name, "keep_alive": MODEL_KEEP_ALIVE},
+                    timeout=TIMEOUT_SECONDS,
+                )
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Failed to preload model at {endpoint.url}: {e}")
+                errors.append(f"{endpoint.url}: {e}")
+                continue
+            logger.info(
+                f"Preloaded model {self.model_name} at {endpoint.url} "
+                f"(keep_alive={MODEL_KEEP_ALIVE})"
+            )
+            # Secondary models are best effort: routing falls back to the primary
+            for model in list(self.models)[1:]:
+                try:
+                    self.session.post(
+                        f"{endpoint.url}/api/generate",
+                        json={"model": model, "keep_alive": MODEL_KEEP_ALIVE},
+                        timeout=TIMEOUT_SECONDS,
+                    ).raise_for_status()
+                except requests.exceptions.RequestException as e:
+                    logger.warning("Failed to preload model %s at %s: %s", model, endpoint.url, e)
+        if len(errors) == len(endpoints):
+            raise RuntimeError(f"Failed to preload model: {'; '.join(errors) or 'no healthy endpoints'}")
+    
+    def build_request(
         self,
         prompt: str,
         system_prompt: Optional[str] = None,
         conversation_history: Optional[List[Dict]] = None,
+        model: Optional[str] = None,
         **kwargs
     ) -> Dict:
         """
-        Generate response from the model.
+        Build the Ollama /api/generate payload for a prompt.
         
         Args:
             prompt: User input prompt
             system_prompt: System prompt for behavior
             conversation_history: Previous conversation turns
+            model: One of self.models (defaults to the primary model)
             **kwargs: Additional parameters to override defaults
             
         Returns:
-            Dict containing response and metadata
+            Request payload
+            
+        Raises:
+            ValueError: If model is not configured
         """
-        start_time = time.time()
+        model = model or self.model_name
+        if model not in self.models:
+            raise ValueError(f"Model '{model}' is not configured")
         
         # Prepare the full prompt
         full_prompt = self._build_prompt(prompt, system_prompt, conversation_history)
         
-        # Get model configuration
-        config = get_model_config()
-        
-        # Override with any provided kwargs
-        if kwargs:
-            config["options"].update(kwargs)
+        # Copy the precomputed options, overridden with any provided kwargs
+        options = {**self.models[model], **kwargs}
         
-        # Prepare request
-        request_data = {
-            "model": config["model"],
+        return {
+            "model": model,
             "prompt": full_prompt,
             "stream": False,
-            "options": config["options"],
+            "options": options,
+            "keep_alive": MODEL_KEEP_ALIVE,
         }
+    
+    @staticmethod
+    def request_key(request_data: Dict) -> str:
+        """
+        Digest identifying a request by model, prompt and options.
         
-        try:
-            logger.debug(f"Sending request to model: {json.dumps(request_data, indent=2)}")
+        Two requests with the same key and deterministic options produce the
+        same output, so their results can be shared.
+        """
+        payload = json.dumps(
+            [request_data["model"], request_data["prompt"], request_data["options"]],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def generate(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
+        deadline: Optional[Deadline] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        model: Optional[str] = None,
+        request: Optional[Dict] = None,
+        **kwargs
+    ) -> Dict:
+        """
+        Generate response from the model.
+        
+        Args:
+            prompt: User input prompt
+            system_prompt: System prompt for behavior
+            conversation_history: Previous conversation turns
+            deadline: End-to-end request deadline bounding timeouts and retries
+            on_token: If given, the response is streamed and this is called
+                with each text fragment as it arrives
+            model: One of self.models (defaults to the primary model)
+            request: Payload already built with build_request(); sent as is,
+                so the prompt is not built again and the arguments above
+                that describe the payload are ignored
+            **kwargs: Additional parameters to override defaults
             
-            response = self.session.post(
-                f"{self.endpoint}/api/generate",
-                json=request_data,
-                timeout=TIMEOUT_SECONDS,
+        Returns:
+            Dict containing response and metadata
+            
+        Raises:
+            CircuitOpenError: If the circuit breaker is rejecting calls
+            TimeoutError: If generation or the deadline timed out
+            RuntimeError: If the request failed
+        """
+        start_time = time.time()
+        
+        if request is not None:
+            request_data = dict(request)
+        else:
+            request_data = self.build_request(
+                prompt, system_prompt, conversation_history, model, **kwargs
             )
-            response.raise_for_status()
+        if on_token is not None:
+            request_data["stream"] = True
+        
+        try:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sending request to model: %s", json.dumps(request_data, indent=2))
             
-            result = response.json()
+            result = self._post_generate(request_data, deadline, on_token)
             elapsed_ms = int((time.time() - start_time) * 1000)
+            self._record_generation(result)
             
             return {
                 "response": result.get("response", ""),
-                "model": result.get("model", self.model_name),
+                "model": result.get("model", request_data["model"]),
                 "created_at": result.get("created_at", ""),
                 "done": result.get("done", True),
                 "context": result.get("context", []),
                 "total_duration": result.get("total_duration", 0),
                 "latency_ms": elapsed_ms,
-                "deterministic": config["options"]["temperature"] == 0,
+                "deterministic": request_data["options"]["temperature"] == 0,
             }
             
         except requests.exceptions.Timeout:
-            logger.error(f"Model request timed out after {TIMEOUT_SECONDS}s")
+            logger.error("Model request timed out after %ss", TIMEOUT_SECONDS)
             raise TimeoutError(f"Model generation timed out after {TIMEOUT_SECONDS}s")
         except requests.exceptions.RequestException as e:
-            logger.error(f"Model request failed: {e}")
+            logger.error("Model request failed: %s", e)
             raise RuntimeError(f"Failed to generate response: {e}")
     
+    def _record_generation(self, result: Dict):
+        """Accumulate Ollama's token counts and generation time."""
+        with self._generation_lock:
+            self._generated["requests"] += 1
+            self._generated["eval_tokens"] += result.get("eval_count", 0)
+            self._generated["eval_ns"] += result.get("eval_duration", 0)
+            self._generated["prompt_tokens"] += result.get("prompt_eval_count", 0)
+    
+    def generation_stats(self) -> Dict:
+        """
+        Get cumulative generation counters.
+        
+        Returns:
+            Requests, generated and prompt tokens, generation time and
+            tokens per second as reported by Ollama
+        """
+        with self._generation_lock:
+            stats = dict(self._generated)
+        eval_s = stats.pop("eval_ns") / 1e9
+        stats["eval_seconds"] = round(eval_s, 3)
+        stats["tokens_per_second"] = round(stats["eval_tokens"] / eval_s, 2) if eval_s else 0.0
+        return stats
+    
+    @staticmethod
+    def _read_stream(
+        response: requests.Response,
+        on_token: Callable[[str], None],
+        deadline: Optional[Deadline] = None,
+    ) -> Dict:
+        """
+        Consume a streamed generate response.
+        
+        Args:
+            response: Streaming HTTP response (one JSON object per line)
+            on_token: Called with each response fragment
+            deadline: Request deadline; reading stops once it has passed
+            
+        Returns:
+            Final chunk metadata with the full response text
+            
+        Raises:
+            requests.exceptions.InvalidJSONError: If a line is not valid JSON
+        """
+        parts = []
+        final: Dict = {}
+        with response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except ValueError as e:
+                    raise requests.exceptions.InvalidJSONError(
+                        f"Malformed line in model stream: {line[:100]!r}"
+                    ) from e
+                fragment = chunk.get("response", "")
+                if fragment:
+                    parts.append(fragment)
+                    on_token(fragment)
+                if chunk.get("done"):
+                    final = chunk
+                    break
+                if deadline is not None and deadline.expired:
+                    raise TimeoutError("Request deadline exceeded while streaming")
+        final["response"] = "".join(parts)
+        return final
+    
+    def _post_generate(
+        self,
+        request_data: Dict,
+        deadline: Optional[Deadline] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+    ) -> Dict:
+        """
+        POST a generate request and read its body, retrying while the deadline allows.
+        
+        Each attempt is routed through the endpoint pool, so a retry can land
+        on a different endpoint. The endpoint stays reserved, and the outcome
+        is recorded, only once the body has been read: for a streamed
+        response that is when the stream ends or fails, so streams count as
+        in flight and their latency covers the whole generation. A stream
+        that already delivered tokens is not retried. The whole call counts
+        as one outcome for the
+        model's circuit breaker. Only timeouts, connection errors, malformed
+        responses and 5xx statuses count as failures; any other exception
+        releases a half-open probe without being counted.
+        
+        Args:
+            request_data: Ollama /api/generate payload
+            deadline: Request deadline; None means only TIMEOUT_SECONDS applies
+            on_token: If given, the response is streamed through this callback
+            
+        Returns:
+            Response body (final chunk metadata with the full text if streamed)
+        """
+        if deadline is not None and deadline.expired:
+            raise TimeoutError("Request deadline exceeded before model call")
+        breaker = self.breakers[request_data["model"]]
+        if not breaker.allow_request():
+            raise CircuitOpenError(
+                f"Circuit breaker for model '{request_data['model']}' is open; failing fast"
+            )
+        
+        try:
+            result = self._post_with_retries(request_data, deadline, on_token)
+        except BaseException as e:
+            if self._is_model_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.release()
+            raise
+        breaker.record_success()
+        return result
+    
+    def _post_with_retries(
+        self,
+        request_data: Dict,
+        deadline: Optional[Deadline] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+    ) -> Dict:
+        """Attempt a generate request up to MODEL_MAX_ATTEMPTS times; see _post_generate."""
+        streamed = []
+        if on_token is not None:
+            def on_token_tracked(fragment: str):
+                streamed.append(True)
+                on_token(fragment)
+        
+        last_error: Optional[requests.exceptions.RequestException] = None
+        for attempt in range(MODEL_MAX_ATTEMPTS):
+            timeout = deadline.timeout(TIMEOUT_SECONDS) if deadline else TIMEOUT_SECONDS
+            if attempt and timeout <= 0:
+                break
+            with self.endpoints.acquire() as endpoint:
+                request_start = time.time()
+                try:
+                    response = self.session.post(
+                        f"{endpoint.url}/api/generate",
+                        json=request_data,
+                        timeout=max(timeout, 0.001),
+                        stream=on_token is not None,
+                    )
+                    with response:
+                        response.raise_for_status()
+                        if on_token is not None:
+                            result = self._read_stream(response, on_token_tracked, deadline)
+                        else:
+                            result = response.json()
+                except requests.exceptions.RequestException as e:
+                    if self._is_model_failure(e):
+                        self.endpoints.record_failure(endpoint)
+                    last_error = e
+                    # Tokens already shown to the client cannot be taken back
+                    if streamed or not self._is_retryable(e):
+                        break
+                else:
+                    self.endpoints.record_success(
+                        endpoint, (time.time() - request_start) * 1000
+                    )
+                    return result
+            
+            # Back off before retrying, but only if the budget allows it
+            backoff = MODEL_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+            if attempt + 1 >= MODEL_MAX_ATTEMPTS:
+                break
+            if deadline is not None and deadline.remaining() <= backoff:
+                logger.warning("Not retrying model call: request deadline too close")
+                break
+            logger.warning(
+                "Model call attempt %d failed (%s); retrying in %.1fs", attempt + 1, last_error, backoff
+            )
+            time.sleep(backoff)
+        
+        raise last_error
+    
+    @staticmethod
+    def _is_model_failure(error: BaseException) -> bool:
+        """Whether an error reflects on the model server's health (not e.g. a 404)."""
+        if isinstance(error, requests.exceptions.HTTPError):
+            return error.response is not None and error.response.status_code >= 500
+        return isinstance(error, (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.InvalidJSONError,
+        ))
+    
+    @staticmethod
+    def _is_retryable(error: requests.exceptions.RequestException) -> bool:
+        """Whether a failed request is worth another attempt."""
+        if isinstance(error, requests.exceptions.HTTPError):
+            return error.response is not None and error.response.status_code in RETRYABLE_STATUSES
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+    
     def _build_prompt(
         self,
         user_prompt: str,
@@ -166,47 +579,74 @@ class ModelProvider:
         Returns:
             Formatted prompt string
         """
-        parts = []
-        
-        # Add system prompt if provided
-        if system_prompt:
-            parts.append(f"### System Instructions ###")
-            parts.append(system_prompt)
-            parts.append("\n### Conversation ###\n")
-        
-        # Add conversation history if provided
-        if conversation_history:
-            for turn in conversation_history:
-                role = turn.get("role", "user")
-                content = turn.get("content", "")
-                if role == "user":
-                    parts.append(f"User: {content}")
-                elif role == "assistant":
-                    parts.append(f"Assistant: {content}")
-            parts.append("")  # Empty line before current prompt
-        
-        # Add current user prompt
-        parts.append(f"User: {user_prompt}")
-        parts.append("\n### Response ###")
-        parts.append("Assistant: ")
-        
-        return "\n".join(parts)
+        return self.template.render(user_prompt, system_prompt, conversation_history)
     
     def health_check(self) -> bool:
         """
         Check if model provider is healthy.
         
         Returns:
-            True if healthy, False otherwise
+            True if at least one endpoint is healthy, False otherwise
         """
-        try:
-            response = self.session.get(
-                f"{self.endpoint}/api/tags",
-                timeout=5
-            )
-            return response.status_code == 200
-        except:
-            return False
+        for endpoint in self.endpoints.endpoints:
+            try:
+                response = self.session.get(
+                    f"{endpoint.url}/api/tags",
+                    timeout=5
+                )
+                if response.status_code == 200:
+                    return True
+            except:
+                continue
+        return False
+    
+    def running_models(self, endpoint: Optional[str] = None) -> List[str]:
+        """
+        List the models currently loaded in Ollama memory.
+        
+        Args:
+            endpoint: Endpoint to query (defaults to the primary endpoint)
+            
+        Returns:
+            Names of the resident models
+            
+        Raises:
+            requests.exceptions.RequestException: If Ollama cannot be queried
+        """
+        response = self.session.get(
+            f"{endpoint or self.endpoint}/api/ps",
+            timeout=5
+        )
+        response.raise_for_status()
+        models = response.json().get("models", [])
+        return [m.get("name") or m.get("model", "") for m in models]
+    
+    def is_model_resident(self) -> bool:
+        """
+        Check if the target model is loaded in Ollama memory.
+        
+        Returns:
+            True if resident on any endpoint, False otherwise
+            (including when unreachable)
+        """
+        for endpoint in self.endpoints.endpoints:
+            try:
+                if self.model_name in self.running_models(endpoint.url):
+                    return True
+            except requests.exceptions.RequestException:
+                continue
+        return False
+    
+    def endpoint_stats(self) -> List[Dict]:
+        """Return routing state of every endpoint."""
+        return self.endpoints.stats()
+    
+    def circuit_stats(self) -> Dict:
+        """Return the primary model's circuit breaker state, with every model's under 'models'."""
+        stats = self.breakers[self.model_name].to_dict()
+        if len(self.breakers) > 1:
+            stats["models"] = {model: breaker.to_dict() for model, breaker in self.breakers.items()}
+        return stats
 
 
 # Singleton instance
@@ -4,14 +4,19 @@ Students must complete TODO sections according to POLICY.md.
 """
 
 import logging
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-import torch
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
-
-from .config import SAFETY_MODE
+from .config import (
+    MODERATION_BACKEND,
+    MODERATION_MODEL_NAME,
+    MODERATION_SOCKET,
+    SAFETY_MODE,
+    SEMANTIC_CACHE_ENABLED,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,18 +38,148 @@ class ModerationResult:
     reason: str  # Human-readable explanation
     confidence: float  # Confidence level (0-1)
     fallback_response: Optional[str] = None  # Response to use if action != ALLOW
+    probabilities: Optional[List[float]] = None  # Classifier output (crisis, medical, harmful)
+    # Unit-length pooled embedding of the text, if the classifier provides one
+    embedding: Optional[Any] = field(default=None, repr=False, compare=False)
+
+
+class TorchClassifier:
+    """DistilBERT sequence classifier running in-process on PyTorch."""
+
+    def __init__(self, model_name: str = MODERATION_MODEL_NAME):
+        """
+        Initialize the classifier.
+
+        The model is not loaded here; torch and transformers are imported on
+        first use (or by an explicit call to load()) so that importing this
+        module and constructing the moderator stay cheap.
+        """
+        self.model_name = model_name
+        self.tokenizer = None
+        self.model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the model has been loaded."""
+        return self.model is not None
+
+    def load(self):
+        """Load the tokenizer and model if not already loaded (thread-safe)."""
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is not None:
+                return
+            from transformers import (
+                AutoModelForSequenceClassification,
+                AutoTokenizer,
+            )
+
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModelForSequenceClassification.from_pretrained(
+                self.model_name, num_labels=3
+            )
+            model.eval()
+            self.tokenizer = tokenizer
+            self.model = model
+            logger.info(f"Loaded moderation model {self.model_name}")
+
+    def memory_stats(self) -> Dict:
+        """
+        Report tensor memory held by the model.
+
+        Returns:
+            Parameter and buffer bytes of the loaded model, plus the CUDA
+            caching allocator's allocated/reserved bytes when CUDA is in use
+        """
+        if self.model is None:
+            return {"loaded": False}
+        import torch
+
+        stats = {
+            "loaded": True,
+            "parameter_bytes": sum(p.numel() * p.element_size() for p in self.model.parameters()),
+            "buffer_bytes": sum(b.numel() * b.element_size() for b in self.model.buffers()),
+            "num_threads": torch.get_num_threads(),
+        }
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            stats["cuda_allocated_bytes"] = torch.cuda.memory_allocated()
+            stats["cuda_reserved_bytes"] = torch.cuda.memory_reserved()
+        return stats
+
+    def predict_proba(self, texts: List[str]) -> List[List[float]]:
+        """
+        Classify texts in one batched forward pass.
+
+        Args:
+            texts: Texts to classify
+
+        Returns:
+            Class probabilities per text (crisis, medical, harmful)
+        """
+        import torch
+
+        self.load()
+        inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, padding=True)
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+        return torch.softmax(outputs.logits, dim=-1).tolist()
+
+    def predict_with_embeddings(self, texts: List[str]) -> Tuple[List[List[float]], Any]:
+        """
+        Classify texts and return their pooled embeddings from the same pass.
+
+        Args:
+            texts: Texts to classify
+
+        Returns:
+            Class probabilities per text, and a float32 array with one
+            unit-length, attention-masked mean of the last hidden layer per text
+        """
+        import torch
+
+        self.load()
+        inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, padding=True)
+        with torch.no_grad():
+            outputs = self.model(**inputs, output_hidden_states=True)
+            mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.hidden_states[-1].dtype)
+            pooled = (outputs.hidden_states[-1] * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            pooled = torch.nn.functional.normalize(pooled, dim=-1)
+        return torch.softmax(outputs.logits, dim=-1).tolist(), pooled.float().numpy()
+
+
+def create_local_classifier():
+    """Create the in-process classifier selected by MODERATION_BACKEND."""
+    if MODERATION_BACKEND == "onnx":
+        from .onnx_classifier import OnnxClassifier
+
+        return OnnxClassifier()
+    return TorchClassifier()
 
 
 class Moderator:
     """Handles content moderation according to safety policy."""
 
-    def __init__(self):
-        """Initialize the moderator with a DistilBERT model."""
+    def __init__(self, classifier=None):
+        """
+        Initialize the moderator.
+
+        Args:
+            classifier: Object providing load(), is_loaded and
+                predict_proba(texts); defaults to the in-process classifier
+                selected by MODERATION_BACKEND
+        """
         self.safety_mode = SAFETY_MODE
-        self.tokenizer = AutoTokenizer.from_pretrained("distilbert-base-uncased")
-        self.model = AutoModelForSequenceClassification.from_pretrained(
-            "distilbert-base-uncased", num_labels=3
-        )
+        self.classifier = classifier or create_local_classifier()
+        # Keep pooled embeddings of moderated texts for the semantic cache
+        self.embeddings = SEMANTIC_CACHE_ENABLED and hasattr(self.classifier, "predict_with_embeddings")
+        if SEMANTIC_CACHE_ENABLED and not self.embeddings:
+            logger.warning("Semantic cache disabled: %s provides no embeddings", type(self.classifier).__name__)
+        self.calls = 0  # classifier calls
+        self.texts = 0  # texts classified
+        self.classify_ms = 0.0  # time spent in the classifier
+        self._stats_lock = threading.Lock()
         self.confidence_thresholds = {
             "strict": {"crisis": 0.3, "medical": 0.4, "harmful": 0.5},
             "balanced": {"crisis": 0.5, "medical": 0.6, "harmful": 0.7},
@@ -91,6 +226,20 @@ If you are in immediate danger or having thoughts of harming yourself or others,
 Remember: Your wellbeing is important! How can I support you today?""",
         }
 
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the classifier model has been loaded."""
+        return self.classifier.is_loaded
+
+    def load(self):
+        """Load the classifier if not already loaded."""
+        self.classifier.load()
+
+    def warm_up(self):
+        """Load the model and run one dummy forward pass."""
+        self.load()
+        self._check_content("Hello")
+
     def moderate(
         self,
         user_prompt: str,
@@ -102,13 +251,19 @@ Remember: Your wellbeing is important! How can I support you today?""",
         """
         content_check = self._check_content(user_prompt)
         if content_check.action != ModerationAction.ALLOW:
-            logger.warning(f"Content detected: {content_check.reason}")
+            logger.warning(
+                "Content detected: %s", content_check.reason,
+                extra={"tags": content_check.tags, "confidence": content_check.confidence},
+            )
             return content_check
 
         if model_response:
             output_check = self._check_content(model_response)
             if output_check.action != ModerationAction.ALLOW:
-                logger.warning(f"Output violation: {output_check.reason}")
+                logger.warning(
+                    "Output violation: %s", output_check.reason,
+                    extra={"tags": output_check.tags, "confidence": output_check.confidence},
+                )
                 return output_check
 
         return ModerationResult(
@@ -116,51 +271,107 @@ Remember: Your wellbeing is important! How can I support you today?""",
             tags=[],
             reason="Content passes all safety checks",
             confidence=1.0,
+            probabilities=content_check.probabilities,
+            embedding=content_check.embedding,
         )
 
+    def check_batch(self, texts: List[str]) -> List[ModerationResult]:
+        """
+        Moderate many independent texts in one batched forward pass.
+        """
+        if not texts:
+            return []
+        probabilities, embeddings = self._classify(texts)
+        results = [
+            self._decide(p, embeddings[i] if embeddings is not None else None)
+            for i, p in enumerate(probabilities)
+        ]
+        for result in results:
+            if result.action != ModerationAction.ALLOW:
+                logger.warning(
+                    "Content detected: %s", result.reason,
+                    extra={"tags": result.tags, "confidence": result.confidence},
+                )
+        return results
+
     def _check_content(self, text: str) -> ModerationResult:
         """
         Check content using a DistilBERT model.
         """
-        inputs = self.tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-        outputs = self.model(**inputs)
-        logits = outputs.logits
-        probabilities = torch.softmax(logits, dim=-1)
-        confidence, predicted_class = torch.max(probabilities, dim=-1)
+        probabilities, embeddings = self._classify([text])
+        return self._decide(probabilities[0], embeddings[0] if embeddings is not None else None)
+
+    def _classify(self, texts: List[str]) -> Tuple[List[List[float]], Optional[Any]]:
+        """
+        Run the classifier, recording call counts and time spent.
+
+        Returns probabilities per text, and their embeddings if enabled.
+        """
+        start = time.perf_counter()
+        if self.embeddings:
+            probabilities, embeddings = self.classifier.predict_with_embeddings(texts)
+        else:
+            probabilities, embeddings = self.classifier.predict_proba(texts), None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.calls += 1
+            self.texts += len(texts)
+            self.classify_ms += elapsed_ms
+        return probabilities, embeddings
+
+    def stats(self) -> Dict:
+        """
+        Return cumulative classifier call counts and time.
+        """
+        with self._stats_lock:
+            return {
+                "calls": self.calls,
+                "texts": self.texts,
+                "classify_ms": round(self.classify_ms, 3),
+            }
+
+    def _decide(self, probabilities: List[float], embedding: Optional[Any] = None) -> ModerationResult:
+        """
+        Apply the safety-mode thresholds to class probabilities.
+        """
+        predicted_class = max(range(len(probabilities)), key=probabilities.__getitem__)
+        confidence = probabilities[predicted_class]
 
         tags = []
         action = ModerationAction.ALLOW
         fallback_response = None
         reason = "Content passes all safety checks"
 
-        if predicted_class.item() == 0:  # Crisis
+        if predicted_class == 0:  # Crisis
             tags.append("crisis")
             threshold = self.confidence_thresholds[self.safety_mode]["crisis"]
-            if confidence.item() >= threshold:
+            if confidence >= threshold:
                 action = ModerationAction.BLOCK
                 fallback_response = self.fallback_templates["crisis"]
-                reason = f"Crisis indicators detected with confidence {confidence.item():.2f}."
-        elif predicted_class.item() == 1:  # Medical
+                reason = f"Crisis indicators detected with confidence {confidence:.2f}."
+        elif predicted_class == 1:  # Medical
             tags.append("medical")
             threshold = self.confidence_thresholds[self.safety_mode]["medical"]
-            if confidence.item() >= threshold:
+            if confidence >= threshold:
                 action = ModerationAction.SAFE_FALLBACK
                 fallback_response = self.fallback_templates["medical"]
-                reason = f"Medical request detected with confidence {confidence.item():.2f}."
-        elif predicted_class.item() == 2:  # Harmful
+                reason = f"Medical request detected with confidence {confidence:.2f}."
+        elif predicted_class == 2:  # Harmful
             tags.append("harmful")
             threshold = self.confidence_thresholds[self.safety_mode]["harmful"]
-            if confidence.item() >= threshold:
+            if confidence >= threshold:
                 action = ModerationAction.BLOCK
                 fallback_response = self.fallback_templates["harmful"]
-                reason = f"Harmful content detected with confidence {confidence.item():.2f}."
+                reason = f"Harmful content detected with confidence {confidence:.2f}."
 
         return ModerationResult(
             action=action,
             tags=tags,
             reason=reason,
-            confidence=confidence.item(),
+            confidence=confidence,
             fallback_response=fallback_response,
+            probabilities=list(probabilities),
+            embedding=embedding,
         )
 
     def get_disclaimer(self) -> str:
@@ -173,8 +384,18 @@ _moderator_instance = None
 
 
 def get_moderator() -> Moderator:
-    """Get singleton moderator instance."""
+    """
+    Get singleton moderator instance.
+
+    Uses the shared moderation service when MODERATION_SOCKET is set,
+    otherwise loads the MODERATION_BACKEND classifier in this process.
+    """
     global _moderator_instance
     if _moderator_instance is None:
-        _moderator_instance = Moderator()
+        classifier = None
+        if MODERATION_SOCKET:
+            from .moderation_service import RemoteClassifier
+
+            classifier = RemoteClassifier(MODERATION_SOCKET)
+        _moderator_instance = Moderator(classifier)
     return _moderator_instance
\ No newline at end of file
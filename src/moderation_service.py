@@ -0,0 +1,283 @@
+"""
+Shared moderation service.
+
+Runs one moderation classifier in a separate local process that every
+backend worker talks to over a Unix socket, so the model is loaded once
+regardless of the number of workers. Requests arriving from different
+workers are batched into shared forward passes.
+
+Messages are pickled, so both ends authenticate with a shared key
+(MODERATION_AUTHKEY_FILE) before anything is exchanged: a process without
+the key can neither impersonate the service nor send it requests.
+
+Usage:
+    python -m src.moderation_service
+    CS3249_MODERATION_SOCKET=data/run/moderation.sock uvicorn app.backend:app --workers 4
+"""
+
+import argparse
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import List, Optional, Tuple
+
+from .config import (
+    MODERATION_AUTHKEY_FILE,
+    MODERATION_BATCH_SIZE,
+    MODERATION_BATCH_WAIT_MS,
+    MODERATION_DEFAULT_SOCKET,
+    MODERATION_SOCKET,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def load_authkey(path: str = MODERATION_AUTHKEY_FILE, create: bool = False) -> bytes:
+    """
+    Read the key shared by the service and its clients.
+
+    Args:
+        path: Key file
+        create: Generate an owner-only key file if it does not exist
+
+    Raises:
+        RuntimeError: If the key cannot be read, or the file is accessible
+            to other users
+    """
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    try:
+        if os.stat(path).st_mode & 0o077:
+            raise RuntimeError(f"Moderation key file {path} must not be accessible to other users")
+        with open(path, "r", encoding="utf-8") as f:
+            key = f.read().strip()
+    except OSError as e:
+        raise RuntimeError(f"Cannot read moderation key file {path}: {e}")
+    if not key:
+        raise RuntimeError(f"Moderation key file {path} is empty")
+    return key.encode("utf-8")
+
+
+class BatchingClassifier:
+    """Collects concurrent classification requests into batched forward passes."""
+
+    def __init__(
+        self,
+        classifier,
+        max_batch_size: int = MODERATION_BATCH_SIZE,
+        max_wait_ms: float = MODERATION_BATCH_WAIT_MS,
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            classifier: Classifier providing predict_proba(texts)
+            max_batch_size: Maximum texts per forward pass
+            max_wait_ms: How long to wait for more requests after the first
+        """
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batches = 0
+        self.texts = 0
+        self._jobs: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="moderation-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for classification; the future resolves to their probabilities."""
+        future: Future = Future()
+        self._jobs.put((texts, future))
+        return future
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        jobs = [self._jobs.get()]
+        size = len(jobs[0][0])
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._jobs.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            size += len(job[0])
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._collect()
+            texts = [text for job_texts, _ in jobs for text in job_texts]
+            try:
+                probabilities = self.classifier.predict_proba(texts)
+            except Exception as e:
+                logger.error(f"Batch classification failed: {e}")
+                for _, future in jobs:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for job_texts, future in jobs:
+                future.set_result(probabilities[offset:offset + len(job_texts)])
+                offset += len(job_texts)
+
+
+class ModerationServer:
+    """Serves classification requests from backend workers over a Unix socket."""
+
+    def __init__(self, socket_path: str, batcher: BatchingClassifier, authkey: bytes):
+        """
+        Initialize the server.
+
+        Args:
+            socket_path: Filesystem path of the Unix socket
+            batcher: Batching classifier that does the work
+            authkey: Key clients must prove they hold
+        """
+        self.socket_path = socket_path
+        self.batcher = batcher
+        self.authkey = authkey
+
+    def serve_forever(self):
+        """Accept connections until interrupted; one thread per connection."""
+        os.makedirs(os.path.dirname(self.socket_path) or ".", mode=0o700, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        with Listener(self.socket_path, family="AF_UNIX", authkey=self.authkey) as listener:
+            os.chmod(self.socket_path, 0o600)
+            logger.info("Moderation service listening on %s", self.socket_path)
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, EOFError, OSError) as e:
+                    logger.warning("Rejected moderation client: %s", e)
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    command, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if command == "classify":
+                        conn.send(("ok", self.batcher.submit(payload).result()))
+                    elif command == "ping":
+                        conn.send(("ok", {"batches": self.batcher.batches, "texts": self.batcher.texts}))
+                    else:
+                        conn.send(("error", f"Unknown command: {command}"))
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    conn.send(("error", str(e)))
+
+
+class RemoteClassifier:
+    """Client for the moderation service with a small pool of connections."""
+
+    def __init__(self, socket_path: str, authkey_file: str = MODERATION_AUTHKEY_FILE):
+        """
+        Initialize the client. No connection is made until first use.
+
+        Args:
+            socket_path: Filesystem path of the service's Unix socket
+            authkey_file: Key file shared with the service
+        """
+        self.socket_path = socket_path
+        self.authkey_file = authkey_file
+        self._connected = False
+        self._pool: "queue.LifoQueue[Connection]" = queue.LifoQueue()
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the service has answered at least once."""
+        return self._connected
+
+    def load(self):
+        """Check that the service is reachable."""
+        self._call("ping", None)
+
+    def predict_proba(self, texts: List[str]) -> List[List[float]]:
+        """
+        Classify texts via the service.
+
+        Args:
+            texts: Texts to classify
+
+        Returns:
+            Class probabilities per text (crisis, medical, harmful)
+        """
+        return self._call("classify", list(texts))
+
+    def _call(self, command: str, payload):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            conn.send((command, payload))
+            status, result = conn.recv()
+        except BaseException as e:
+            # The connection may be mid-message; never reuse it
+            conn.close()
+            self._connected = False
+            if isinstance(e, (EOFError, OSError)):
+                raise RuntimeError(f"Moderation service connection failed: {e}")
+            raise
+        self._pool.put(conn)
+        if status != "ok":
+            raise RuntimeError(f"Moderation service error: {result}")
+        self._connected = True
+        return result
+
+    def _connect(self) -> Connection:
+        authkey = load_authkey(self.authkey_file)
+        try:
+            return Client(self.socket_path, family="AF_UNIX", authkey=authkey)
+        except (AuthenticationError, EOFError, OSError) as e:
+            raise RuntimeError(f"Cannot connect to moderation service at {self.socket_path}: {e}")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Run the moderation service."""
+    parser = argparse.ArgumentParser(description="Shared moderation service")
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=MODERATION_SOCKET or MODERATION_DEFAULT_SOCKET,
+        help="Unix socket path to listen on",
+    )
+    parser.add_argument(
+        "--authkey-file",
+        type=str,
+        default=MODERATION_AUTHKEY_FILE,
+        help="Key file shared with clients (created if missing)",
+    )
+    args = parser.parse_args(argv)
+
+    from .logging_utils import configure_logging
+    from .moderation import create_local_classifier
+
+    configure_logging()
+    classifier = create_local_classifier()
+    classifier.load()
+    authkey = load_authkey(args.authkey_file, create=True)
+    ModerationServer(args.socket, BatchingClassifier(classifier), authkey).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+ONNX Runtime backend for the moderation classifier.
+
+Runs a model exported by scripts/export_moderator.py without importing
+torch or transformers: tokenization uses the `tokenizers` library and
+inference uses onnxruntime (pip install onnxruntime).
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import List
+
+import numpy as np
+
+from .config import MODERATION_ONNX_DIR, MODERATION_ONNX_FILE
+
+logger = logging.getLogger(__name__)
+
+# Files written by scripts/export_moderator.py
+TOKENIZER_FILE = "tokenizer.json"
+METADATA_FILE = "moderator.json"
+
+
+class OnnxClassifier:
+    """Moderation classifier running an exported graph on ONNX Runtime."""
+
+    def __init__(
+        self,
+        model_dir: str = MODERATION_ONNX_DIR,
+        model_file: str = MODERATION_ONNX_FILE,
+    ):
+        """
+        Initialize the classifier. Nothing is loaded until first use.
+
+        Args:
+            model_dir: Directory produced by the export script
+            model_file: Model file inside model_dir (e.g. model.int8.onnx)
+        """
+        self.model_dir = model_dir
+        self.model_file = model_file
+        self.tokenizer = None
+        self.session = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the model has been loaded."""
+        return self.session is not None
+
+    def load(self):
+        """Load the tokenizer and inference session (thread-safe)."""
+        if self.session is not None:
+            return
+        with self._load_lock:
+            if self.session is not None:
+                return
+            try:
+                import onnxruntime
+                from tokenizers import Tokenizer
+            except ImportError as e:
+                raise RuntimeError(
+                    f"ONNX moderation backend requires onnxruntime and tokenizers: {e}"
+                )
+
+            model_path = os.path.join(self.model_dir, self.model_file)
+            if not os.path.exists(model_path):
+                raise RuntimeError(
+                    f"ONNX moderation model not found at {model_path}. "
+                    f"Run: python scripts/export_moderator.py"
+                )
+            with open(os.path.join(self.model_dir, METADATA_FILE), "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+
+            tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, TOKENIZER_FILE))
+            tokenizer.enable_truncation(max_length=metadata["max_length"])
+            tokenizer.enable_padding(
+                pad_id=metadata["pad_token_id"], pad_token=metadata["pad_token"]
+            )
+
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = onnxruntime.InferenceSession(
+                model_path, options, providers=["CPUExecutionProvider"]
+            )
+            self.tokenizer = tokenizer
+            self.session = session
+            logger.info(f"Loaded ONNX moderation model {model_path}")
+
+    def predict_proba(self, texts: List[str]) -> List[List[float]]:
+        """
+        Classify texts in one batched forward pass.
+
+        Args:
+            texts: Texts to classify
+
+        Returns:
+            Class probabilities per text (crisis, medical, harmful)
+        """
+        self.load()
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        (logits,) = self.session.run(
+            ["logits"], {"input_ids": input_ids, "attention_mask": attention_mask}
+        )
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return (exp / exp.sum(axis=-1, keepdims=True)).tolist()
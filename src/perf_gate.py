@@ -0,0 +1,137 @@
+"""
+Performance regression gate for evaluation runs.
+
+Summarizes a run into a few performance metrics and compares them with a
+stored baseline, flagging any metric that regressed by more than its
+tolerance.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import PERF_TOLERANCES
+
+# Metrics where a larger value is an improvement
+HIGHER_IS_BETTER = {"tokens_per_second"}
+
+
+def collect_metrics(
+    outputs: List[Dict],
+    moderation_stats: Dict,
+    generation_stats: Dict,
+) -> Dict[str, float]:
+    """
+    Summarize a run's performance.
+
+    Args:
+        outputs: Evaluation output records
+        moderation_stats: Moderator.stats() delta over the run
+        generation_stats: ModelProvider.generation_stats() delta over the run
+
+    Returns:
+        Metric name -> value
+    """
+    latencies = np.array(
+        [o.get("latency_ms", 0) for o in outputs if o.get("safety_action") != "error"],
+        dtype=np.float64,
+    )
+    calls = moderation_stats.get("calls", 0)
+    eval_seconds = generation_stats.get("eval_seconds", 0)
+    return {
+        "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+        "latency_p95_ms": float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        "moderation_ms_per_call": moderation_stats.get("classify_ms", 0) / calls if calls else 0.0,
+        "tokens_per_second": generation_stats.get("eval_tokens", 0) / eval_seconds if eval_seconds else 0.0,
+    }
+
+
+def stats_delta(after: Dict, before: Dict) -> Dict:
+    """Subtract two snapshots of cumulative numeric counters."""
+    return {
+        key: value - before.get(key, 0)
+        for key, value in after.items()
+        if isinstance(value, (int, float))
+    }
+
+
+def load_baseline(path: str) -> Dict:
+    """
+    Read a baseline file.
+
+    The file holds {"metrics": {...}} and optionally {"tolerances": {...}}
+    overriding PERF_TOLERANCES per metric.
+
+    Raises:
+        FileNotFoundError: If the baseline does not exist
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Baseline not found: {path}")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_baseline(path: str, metrics: Dict[str, float], tolerances: Optional[Dict] = None):
+    """Write metrics as a new baseline file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {"metrics": metrics, "tolerances": tolerances or dict(PERF_TOLERANCES)},
+            f,
+            indent=2,
+        )
+
+
+def check_regressions(
+    metrics: Dict[str, float],
+    baseline: Dict,
+    tolerance: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Compare metrics with a baseline.
+
+    Args:
+        metrics: Current metrics from collect_metrics
+        baseline: Baseline file contents
+        tolerance: Overrides every per-metric tolerance if given
+
+    Returns:
+        One row per metric present in both, with 'regressed' set when the
+        metric is worse than baseline by more than its tolerance
+    """
+    tolerances = {**PERF_TOLERANCES, **baseline.get("tolerances", {})}
+    rows = []
+    for name, reference in baseline.get("metrics", {}).items():
+        if name not in metrics:
+            continue
+        allowed = tolerance if tolerance is not None else tolerances.get(name, 0.0)
+        current = metrics[name]
+        if name in HIGHER_IS_BETTER:
+            limit = reference * (1 - allowed)
+            regressed = current < limit
+        else:
+            limit = reference * (1 + allowed)
+            regressed = current > limit
+        rows.append({
+            "metric": name,
+            "baseline": reference,
+            "current": current,
+            "limit": limit,
+            "change": (current - reference) / reference if reference else 0.0,
+            "regressed": regressed,
+        })
+    return rows
+
+
+def format_report(rows: List[Dict]) -> str:
+    """Format regression check rows as a table."""
+    lines = [f"{'metric':<24} {'baseline':>10} {'current':>10} {'limit':>10} {'change':>8}"]
+    for row in rows:
+        lines.append(
+            f"{row['metric']:<24} {row['baseline']:>10.2f} {row['current']:>10.2f} "
+            f"{row['limit']:>10.2f} {row['change']:>+8.1%}"
+            + ("  REGRESSED" if row["regressed"] else "")
+        )
+    return "\n".join(lines)
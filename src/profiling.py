@@ -0,0 +1,131 @@
+"""
+Stack-sampling profiler for the running backend.
+
+A background thread periodically captures the Python stack of every thread
+(or of selected threads) with sys._current_frames() and counts identical
+stacks. The result is written in collapsed-stack format ("frame;frame;frame
+count" per line), which flamegraph.pl, speedscope and similar tools read
+directly. Nothing is instrumented, so the profiled code runs at full speed
+apart from the sampling thread's own work.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from .config import PROFILE_INTERVAL_MS
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a whole-process profile is already running."""
+
+
+class StackSampler:
+    """Samples thread stacks at a fixed interval into collapsed stacks."""
+
+    def __init__(
+        self,
+        interval_ms: float = PROFILE_INTERVAL_MS,
+        thread_ids: Optional[Iterable[int]] = None,
+    ):
+        """
+        Initialize the sampler.
+
+        Args:
+            interval_ms: Time between samples
+            thread_ids: Threads to sample; all threads except the sampler if None
+        """
+        self.interval_ms = interval_ms
+        self.thread_ids = set(thread_ids) if thread_ids is not None else None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self.duration_s = 0.0
+
+    def start(self):
+        """Start sampling in a background thread."""
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration_s = time.perf_counter() - self._started_at
+
+    def __enter__(self) -> "StackSampler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        interval_s = self.interval_ms / 1000
+        while not self._stop.wait(interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    module = frame.f_globals.get("__name__", "?")
+                    frames.append(f"{module}:{getattr(code, 'co_qualname', code.co_name)}")
+                    frame = frame.f_back
+                frames.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(frames))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Return the profile in collapsed-stack format, heaviest stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, top: int = 10) -> Dict:
+        """Return sample counts and the most frequent leaf frames."""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return {
+            "samples": self.samples,
+            "duration_s": round(self.duration_s, 3),
+            "interval_ms": self.interval_ms,
+            "top_frames": [{"frame": frame, "samples": n} for frame, n in leaves.most_common(top)],
+        }
+
+
+# Only one whole-process profile at a time
+_process_profile_lock = threading.Lock()
+
+
+def profile_process(seconds: float, interval_ms: float = PROFILE_INTERVAL_MS) -> StackSampler:
+    """
+    Sample all threads for a number of seconds.
+
+    Args:
+        seconds: How long to sample
+        interval_ms: Time between samples
+
+    Returns:
+        The stopped sampler
+
+    Raises:
+        ProfilerBusy: If another whole-process profile is running
+    """
+    if not _process_profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        with StackSampler(interval_ms) as sampler:
+            time.sleep(seconds)
+        return sampler
+    finally:
+        _process_profile_lock.release()
@@ -0,0 +1,179 @@
+"""
+In-process token-bucket rate limiting.
+
+Each key (a client address or a session id) owns a bucket that refills at a
+steady rate up to a burst size; a request spends one token. Buckets are kept
+in least-recently-used order, so idle ones are dropped in amortized O(1) as
+other keys are touched. A bucket idle long enough to refill completely is
+indistinguishable from a new one, which makes that cleanup lossless.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .config import (
+    RATE_LIMIT_CLIENT_BURST,
+    RATE_LIMIT_CLIENT_RPS,
+    RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_SESSION_BURST,
+    RATE_LIMIT_SESSION_RPS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(RuntimeError):
+    """Raised when a key has exhausted its bucket; carries a retry hint."""
+
+    def __init__(self, message: str, retry_after: float, scope: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+class _Bucket:
+    """Tokens left and when they were last refilled."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class TokenBucketLimiter:
+    """Token buckets for many keys sharing one rate and burst."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Tokens added per second; 0 disables limiting
+            burst: Bucket capacity
+            max_keys: Buckets kept; the least recently used are evicted
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_keys = max_keys
+        # Seconds after which an untouched bucket is full again
+        self.idle_seconds = self.burst / rate if rate > 0 else 0.0
+        self.allowed = 0
+        self.limited = 0
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether this limit is active."""
+        return self.rate > 0
+
+    def acquire(self, key: str) -> float:
+        """
+        Spend one token from a key's bucket.
+
+        Args:
+            key: Client address or session id
+
+        Returns:
+            0.0 if allowed, otherwise seconds until a token is available
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(self.burst, now)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                self.allowed += 1
+                return 0.0
+            self.limited += 1
+            return (1 - bucket.tokens) / self.rate
+
+    def _evict_idle(self, now: float):
+        """Drop buckets that have refilled completely, oldest first."""
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated < self.idle_seconds:
+                break
+            del self._buckets[key]
+
+    def stats(self) -> Dict:
+        """Return limit settings and counters."""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "active_keys": len(self._buckets),
+                "allowed": self.allowed,
+                "limited": self.limited,
+            }
+
+
+class RateLimiter:
+    """Per-client and per-session limits applied to chat requests."""
+
+    def __init__(self):
+        """Initialize both limits from config."""
+        self.client = TokenBucketLimiter(RATE_LIMIT_CLIENT_RPS, RATE_LIMIT_CLIENT_BURST)
+        self.session = TokenBucketLimiter(RATE_LIMIT_SESSION_RPS, RATE_LIMIT_SESSION_BURST)
+
+    def check(self, client: Optional[str], session_id: Optional[str] = None):
+        """
+        Admit one request from a client, optionally within a session.
+
+        The client is checked first so that a limited client does not also
+        spend session tokens.
+
+        Args:
+            client: Client address, or None if unknown
+            session_id: Session the request belongs to, if any
+
+        Raises:
+            RateLimited: If either bucket is empty
+        """
+        if client:
+            retry_after = self.client.acquire(client)
+            if retry_after:
+                logger.warning("Rate limited client %s", client)
+                raise RateLimited("Too many requests from this client", retry_after, "client")
+        if session_id:
+            retry_after = self.session.acquire(session_id)
+            if retry_after:
+                logger.warning("Rate limited session %s", session_id)
+                raise RateLimited("Too many requests in this session", retry_after, "session")
+
+    def stats(self) -> Dict:
+        """Return counters of both limits."""
+        return {"client": self.client.stats(), "session": self.session.stats()}
+
+
+def retry_after_header(retry_after: float) -> str:
+    """Format a retry hint for the Retry-After header (whole seconds, at least 1)."""
+    return str(max(1, math.ceil(retry_after)))
+
+
+# Singleton instance
+_limiter_instance = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get or create singleton rate limiter."""
+    global _limiter_instance
+    if _limiter_instance is None:
+        _limiter_instance = RateLimiter()
+    return _limiter_instance
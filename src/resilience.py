@@ -0,0 +1,170 @@
+"""
+Deadlines and circuit breaking for model calls.
+
+A Deadline carries the remaining time budget of a request from the API
+layer down to the model provider, so retries are only attempted while the
+caller is still waiting. The CircuitBreaker fails fast when Ollama's recent
+error rate is too high instead of queueing more doomed requests.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from .config import (
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_MIN_REQUESTS,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_WINDOW_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """Absolute point in time by which a request must complete."""
+
+    def __init__(self, seconds: float):
+        """
+        Initialize a deadline.
+
+        Args:
+            seconds: Time budget from now
+        """
+        self.budget_seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.remaining() <= 0.0
+
+    def timeout(self, cap: float) -> float:
+        """Return the remaining budget capped at a per-call timeout."""
+        return min(cap, self.remaining())
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker.
+
+    Closed: calls pass and outcomes are recorded in a rolling window.
+    Open: calls are rejected until the cool-down elapses.
+    Half-open: a single probe call is let through; its outcome closes or
+    re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        window_size: int = CIRCUIT_WINDOW_SIZE,
+        min_requests: int = CIRCUIT_MIN_REQUESTS,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_rate: Failure fraction in the window that opens the circuit
+            window_size: Number of recent calls considered
+            min_requests: Minimum calls in the window before the rate applies
+            open_seconds: Cool-down before a probe call is allowed
+        """
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window_size)  # True = success
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Check whether a call may proceed, transitioning open -> half-open."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # Half-open: only one probe at a time
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """Record a successful call."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                logger.info("Circuit breaker closed after successful probe")
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                self._probe_in_flight = False
+            self._outcomes.append(True)
+
+    def release(self):
+        """
+        End a call without counting its outcome.
+
+        For errors that say nothing about the model's health (e.g. a 4xx);
+        a half-open probe is freed so the next call can probe instead.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call, opening the circuit if the error rate is too high."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (
+                self.state == self.CLOSED
+                and len(self._outcomes) >= self.min_requests
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._probe_in_flight = False
+        logger.warning(f"Circuit breaker opened for {self.open_seconds}s")
+
+    def to_dict(self) -> Dict:
+        """Return breaker state as a JSON-serializable dictionary."""
+        with self._lock:
+            window = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            return {
+                "state": self.state,
+                "window_requests": window,
+                "window_failure_rate": round(failures / window, 3) if window else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,149 @@
+"""
+Tiered model routing.
+
+Short turns that the moderator considers low-risk are answered by a smaller,
+faster model; longer or riskier turns, and turns whose fast generation
+failed, go to the primary model. Risk is read from the input moderation's
+class probabilities: how far the predicted class has moved from the uniform
+distribution towards its SAFETY_MODE threshold, so the router becomes more
+conservative together with the moderator.
+"""
+
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from .config import (
+    FAST_MODEL_NAME,
+    MODEL_NAME,
+    ROUTING_MAX_PROMPT_CHARS,
+    ROUTING_MAX_RISK,
+)
+from .moderation import ModerationResult, get_moderator
+
+# Moderator class order of ModerationResult.probabilities
+RISK_CLASSES = ("crisis", "medical", "harmful")
+
+
+class ModelRouter:
+    """Chooses the model for each allowed turn and counts the choices."""
+
+    def __init__(
+        self,
+        thresholds: Dict[str, float],
+        fast_model: str = FAST_MODEL_NAME,
+        primary_model: str = MODEL_NAME,
+        max_prompt_chars: int = ROUTING_MAX_PROMPT_CHARS,
+        max_risk: float = ROUTING_MAX_RISK,
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            thresholds: Moderator confidence threshold per risk class
+            fast_model: Model for low-risk turns; routing is off if empty
+            primary_model: Model for everything else
+            max_prompt_chars: Longest user message sent to the fast model
+            max_risk: Highest risk (see risk()) sent to the fast model
+        """
+        self.thresholds = thresholds
+        self.fast_model = fast_model
+        self.primary_model = primary_model
+        self.max_prompt_chars = max_prompt_chars
+        self.max_risk = max_risk
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether a distinct fast model is configured."""
+        return bool(self.fast_model) and self.fast_model != self.primary_model
+
+    def risk(self, moderation: Optional[ModerationResult]) -> Optional[float]:
+        """
+        Score how close a moderation result came to being acted on.
+
+        Mirrors the moderator's decision rule, which compares the predicted
+        class's probability with that class's threshold. The predicted
+        probability is never below 1/K for K classes, so it is measured from
+        that floor: 0.0 is a uniform prediction, 1.0 is the threshold.
+
+        Returns:
+            (p - 1/K) / (threshold - 1/K) for the predicted class, clamped
+            to [0, 1] (1.0 if the threshold is at or below 1/K, since such
+            a class is acted on whenever predicted), or None if
+            probabilities are unavailable
+        """
+        if moderation is None or not moderation.probabilities:
+            return None
+        probabilities = moderation.probabilities
+        predicted = max(range(len(probabilities)), key=probabilities.__getitem__)
+        floor = 1.0 / len(probabilities)
+        span = self.thresholds[RISK_CLASSES[predicted]] - floor
+        if span <= 0:
+            return 1.0
+        return min(1.0, max(0.0, (probabilities[predicted] - floor) / span))
+
+    def route(self, user_input: str, moderation: Optional[ModerationResult]) -> str:
+        """
+        Choose the model for a turn that passed input moderation.
+
+        Args:
+            user_input: User's message
+            moderation: Input moderation result
+
+        Returns:
+            Model name
+        """
+        if not self.enabled:
+            return self.primary_model
+        risk = self.risk(moderation)
+        if len(user_input) > self.max_prompt_chars:
+            reason = "long"
+        elif risk is None:
+            reason = "no_probabilities"
+        elif risk > self.max_risk:
+            reason = "risky"
+        else:
+            reason = "fast"
+        with self._lock:
+            self._counts[reason] += 1
+        return self.fast_model if reason == "fast" else self.primary_model
+
+    def record_escalation(self):
+        """Count a fast-model failure that was retried on the primary model."""
+        with self._lock:
+            self._counts["escalated"] += 1
+
+    def stats(self) -> Dict:
+        """Return routing counters."""
+        with self._lock:
+            counts = dict(self._counts)
+        routed = sum(counts.get(reason, 0) for reason in ("fast", "long", "risky", "no_probabilities"))
+        return {
+            "enabled": self.enabled,
+            "fast_model": self.fast_model or None,
+            "primary_model": self.primary_model,
+            "routed": routed,
+            "fast": counts.get("fast", 0),
+            "primary": {
+                "long": counts.get("long", 0),
+                "risky": counts.get("risky", 0),
+                "no_probabilities": counts.get("no_probabilities", 0),
+            },
+            "escalated": counts.get("escalated", 0),
+            "fast_ratio": round(counts.get("fast", 0) / routed, 3) if routed else 0.0,
+        }
+
+
+# Singleton instance
+_router_instance = None
+
+
+def get_router() -> ModelRouter:
+    """Get or create singleton router using the moderator's thresholds."""
+    global _router_instance
+    if _router_instance is None:
+        moderator = get_moderator()
+        _router_instance = ModelRouter(moderator.confidence_thresholds[moderator.safety_mode])
+    return _router_instance
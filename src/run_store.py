@@ -0,0 +1,198 @@
+"""
+Columnar storage of evaluation runs.
+
+A run is saved as a compressed .npz file holding one array per field,
+sorted by test id, plus a JSON metadata blob describing the configuration
+that produced it. Comparing two runs is a handful of vectorized operations
+over those arrays, so it stays fast for suites with millions of rows.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import (
+    FAST_MODEL_NAME,
+    MODEL_NAME,
+    MODERATION_BACKEND,
+    MODERATION_MODEL_NAME,
+    RUNS_DIR,
+    SAFETY_MODE,
+)
+
+# Codes of the safety_action column; anything else is stored as "unknown"
+ACTIONS = ("allow", "block", "safe_fallback", "error", "unknown")
+_ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+
+
+@dataclass
+class Run:
+    """Columns of one evaluation run, sorted by id."""
+
+    ids: np.ndarray  # str
+    actions: np.ndarray  # int8 codes into ACTIONS
+    latency_ms: np.ndarray  # float32
+    response_hash: np.ndarray  # uint64 digest of the response text
+    metadata: Dict = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _response_digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def run_metadata(**extra) -> Dict:
+    """Describe the configuration a run was produced with."""
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "model_name": MODEL_NAME,
+        "fast_model_name": FAST_MODEL_NAME or None,
+        "safety_mode": SAFETY_MODE,
+        "moderation_backend": MODERATION_BACKEND,
+        "moderation_model": MODERATION_MODEL_NAME,
+        **extra,
+    }
+
+
+def records_to_run(records: List[Dict], metadata: Optional[Dict] = None) -> Run:
+    """
+    Convert evaluation output records to columns.
+
+    Args:
+        records: Records in the tests/expected_schema.json format
+        metadata: Run metadata (defaults to run_metadata())
+
+    Returns:
+        Run sorted by id
+    """
+    ids = np.array([str(r["id"]) for r in records])
+    order = np.argsort(ids, kind="stable")
+    unknown = _ACTION_CODES["unknown"]
+    return Run(
+        ids=ids[order],
+        actions=np.array(
+            [_ACTION_CODES.get(r.get("safety_action"), unknown) for r in records], dtype=np.int8
+        )[order],
+        latency_ms=np.array([r.get("latency_ms", 0) for r in records], dtype=np.float32)[order],
+        response_hash=np.array(
+            [_response_digest(r.get("response", "")) for r in records], dtype=np.uint64
+        )[order],
+        metadata=metadata if metadata is not None else run_metadata(),
+    )
+
+
+def save_run(run: Run, path: str) -> str:
+    """
+    Write a run to a compressed .npz file.
+
+    Args:
+        run: Run to save
+        path: Output file (.npz is appended if missing)
+
+    Returns:
+        Path written
+    """
+    if not path.endswith(".npz"):
+        path += ".npz"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez_compressed(
+        path,
+        ids=run.ids,
+        actions=run.actions,
+        latency_ms=run.latency_ms,
+        response_hash=run.response_hash,
+        metadata=np.array(json.dumps(run.metadata)),
+    )
+    return path
+
+
+def load_run(path: str) -> Run:
+    """
+    Read a run written by save_run.
+
+    Args:
+        path: .npz file, or a run name inside RUNS_DIR
+
+    Raises:
+        FileNotFoundError: If the run does not exist
+    """
+    if not os.path.exists(path):
+        candidate = os.path.join(RUNS_DIR, path if path.endswith(".npz") else path + ".npz")
+        if not os.path.exists(candidate):
+            raise FileNotFoundError(f"Run not found: {path}")
+        path = candidate
+    with np.load(path, allow_pickle=False) as data:
+        return Run(
+            ids=data["ids"],
+            actions=data["actions"],
+            latency_ms=data["latency_ms"],
+            response_hash=data["response_hash"],
+            metadata=json.loads(str(data["metadata"])),
+        )
+
+
+def diff_runs(base: Run, head: Run, top: int = 10) -> Dict:
+    """
+    Compare two runs by test id.
+
+    Args:
+        base: Reference run
+        head: Run being checked
+        top: Number of largest latency regressions and flips to list
+
+    Returns:
+        Counts of added/removed ids, safety_action transitions, response
+        changes, latency delta statistics and the top regressions
+    """
+    common, base_idx, head_idx = np.intersect1d(
+        base.ids, head.ids, assume_unique=True, return_indices=True
+    )
+    base_actions = base.actions[base_idx].astype(np.int64)
+    head_actions = head.actions[head_idx].astype(np.int64)
+    flipped = base_actions != head_actions
+
+    # Transition counts as a len(ACTIONS) x len(ACTIONS) matrix in one pass
+    k = len(ACTIONS)
+    transitions = np.bincount(base_actions[flipped] * k + head_actions[flipped], minlength=k * k)
+    transitions = transitions.reshape(k, k)
+
+    delta = head.latency_ms[head_idx].astype(np.float64) - base.latency_ms[base_idx]
+    regressions = np.argsort(-delta, kind="stable")[:top] if len(delta) else np.array([], dtype=int)
+    flip_idx = np.flatnonzero(flipped)[:top]
+
+    return {
+        "base": base.metadata,
+        "head": head.metadata,
+        "compared": int(len(common)),
+        "added": int(len(head) - len(common)),
+        "removed": int(len(base) - len(common)),
+        "action_flips": int(flipped.sum()),
+        "transitions": {
+            f"{ACTIONS[i]}->{ACTIONS[j]}": int(transitions[i, j])
+            for i, j in zip(*np.nonzero(transitions))
+        },
+        "response_changed": int((base.response_hash[base_idx] != head.response_hash[head_idx]).sum()),
+        "latency_delta_ms": {
+            "mean": float(delta.mean()) if len(delta) else 0.0,
+            "p50": float(np.percentile(delta, 50)) if len(delta) else 0.0,
+            "p95": float(np.percentile(delta, 95)) if len(delta) else 0.0,
+            "base_p50": float(np.percentile(base.latency_ms, 50)) if len(base) else 0.0,
+            "head_p50": float(np.percentile(head.latency_ms, 50)) if len(head) else 0.0,
+        },
+        "top_regressions": [
+            {"id": str(common[i]), "base_ms": float(base.latency_ms[base_idx[i]]),
+             "head_ms": float(head.latency_ms[head_idx[i]]), "delta_ms": float(delta[i])}
+            for i in regressions
+        ],
+        "sample_flips": [
+            {"id": str(common[i]), "base": ACTIONS[base_actions[i]], "head": ACTIONS[head_actions[i]]}
+            for i in flip_idx
+        ],
+    }
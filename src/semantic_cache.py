@@ -0,0 +1,181 @@
+"""
+Semantic cache of allowed first-turn responses.
+
+By default a hit requires the same normalized message text (case,
+whitespace and punctuation folded). Paraphrase hits can be enabled with a
+calibrated cosine threshold over the unit-length embeddings the moderator
+computes for every user message anyway, so a lookup costs one
+matrix-vector product over a preallocated NumPy array and no extra model
+pass. Entries are tagged with the input's moderation outcome, and a hit
+always requires the same outcome, so a message the moderator judges
+differently is never answered with cached text.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .config import SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD
+from .moderation import ModerationAction, ModerationResult
+
+
+def outcome_code(moderation: ModerationResult) -> int:
+    """
+    Encode the parts of a moderation result a cached response depends on.
+
+    Combines the action with the predicted class, so e.g. an allowed message
+    leaning "medical" never shares responses with one leaning "crisis".
+    """
+    probabilities = moderation.probabilities or []
+    predicted = max(range(len(probabilities)), key=probabilities.__getitem__) if probabilities else -1
+    return list(ModerationAction).index(moderation.action) * 8 + predicted + 1
+
+
+def normalize_text(text: str) -> str:
+    """Fold case, punctuation and whitespace so trivially different messages share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.casefold()).split())
+
+
+class SemanticCache:
+    """Fixed-capacity cosine-similarity index of cached responses."""
+
+    def __init__(self, capacity: int = SEMANTIC_CACHE_SIZE, threshold: Optional[float] = SEMANTIC_CACHE_THRESHOLD):
+        """
+        Initialize an empty cache; arrays are allocated on the first insert.
+
+        Args:
+            capacity: Entries kept; the least recently used is replaced when full
+            threshold: Calibrated minimum cosine similarity for a paraphrase
+                hit, or None to only hit on the same normalized text
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self._vectors: Optional[np.ndarray] = None  # (capacity, dim) float32
+        self._outcomes = np.full(capacity, -1, dtype=np.int64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._entries: list = [None] * capacity  # (response, model, key) per slot
+        self._slots: Dict[Tuple[int, str], int] = {}  # (outcome, normalized text) -> slot
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _best_match(self, embedding: np.ndarray, outcome: int) -> Tuple[int, float]:
+        """Index and similarity of the closest entry with the same outcome (-1 if none)."""
+        if self._size == 0 or self._vectors is None or embedding.shape[-1] != self._vectors.shape[1]:
+            return -1, 0.0
+        similarity = self._vectors[:self._size] @ embedding
+        similarity[self._outcomes[:self._size] != outcome] = -np.inf
+        best = int(np.argmax(similarity))
+        return best, float(similarity[best])
+
+    def _find(self, embedding: np.ndarray, key: Tuple[int, str]) -> Tuple[int, float]:
+        """Slot and similarity of the entry that would answer a message (-1 if none)."""
+        slot = self._slots.get(key, -1)
+        if slot >= 0:
+            return slot, 1.0
+        if self.threshold is None:
+            return -1, 0.0
+        best, similarity = self._best_match(embedding, key[0])
+        return (best, similarity) if best >= 0 and similarity >= self.threshold else (-1, 0.0)
+
+    def lookup(self, moderation: ModerationResult, text: str) -> Optional[Dict]:
+        """
+        Find a cached response for a message.
+
+        Args:
+            moderation: Input moderation result carrying the message embedding
+            text: The user's message
+
+        Returns:
+            Dict with response, model and similarity, or None on a miss
+        """
+        if moderation.embedding is None:
+            return None
+        embedding = np.asarray(moderation.embedding, dtype=np.float32)
+        with self._lock:
+            best, similarity = self._find(embedding, (outcome_code(moderation), normalize_text(text)))
+            if best < 0:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[best] = time.monotonic()
+            response, model, _ = self._entries[best]
+        return {"response": response, "model": model, "similarity": round(similarity, 4)}
+
+    def insert(self, moderation: ModerationResult, text: str, response: str, model: str):
+        """
+        Cache an allowed response to a message.
+
+        Nothing is stored if an equivalent entry already exists.
+
+        Args:
+            moderation: Input moderation result carrying the message embedding
+            text: The user's message
+            response: Model response that passed output moderation
+            model: Model that produced it
+        """
+        if moderation.embedding is None or self.capacity <= 0:
+            return
+        embedding = np.asarray(moderation.embedding, dtype=np.float32)
+        key = (outcome_code(moderation), normalize_text(text))
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, embedding.shape[-1]), dtype=np.float32)
+            if self._find(embedding, key)[0] >= 0:
+                return
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                del self._slots[self._entries[slot][2]]
+            self._vectors[slot] = embedding
+            self._outcomes[slot] = key[0]
+            self._last_used[slot] = time.monotonic()
+            self._entries[slot] = (response, model, key)
+            self._slots[key] = slot
+            self.inserts += 1
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._size = 0
+            self._outcomes.fill(-1)
+            self._last_used.fill(0.0)
+            self._entries = [None] * self.capacity
+            self._slots.clear()
+
+    def stats(self) -> Dict:
+        """Return cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "inserts": self.inserts,
+                "bytes": self._vectors.nbytes if self._vectors is not None else 0,
+            }
+
+
+# Singleton instance
+_cache_instance = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get or create singleton semantic cache."""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = SemanticCache()
+    return _cache_instance
@@ -0,0 +1,359 @@
+"""
+Durable conversation sessions.
+
+Keeps an append-only log of conversation turns in a local SQLite database.
+Writes are queued and committed in batches by a background thread
+(write-behind), so recording a turn never waits on the disk. Each batch takes
+the database write lock up front, so workers sharing the file never assign
+the same sequence numbers, and a failing write is retried on its own without
+affecting other sessions in the batch. Sessions are read back lazily when a
+message arrives for a session that is not in memory, and sessions idle for
+longer than the retention period are purged by the writer thread.
+"""
+
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from .config import (
+    SESSION_DB_PATH,
+    SESSION_FLUSH_INTERVAL_MS,
+    SESSION_LOAD_FLUSH_SECONDS,
+    SESSION_PURGE_INTERVAL_SECONDS,
+    SESSION_RETENTION_SECONDS,
+    SESSION_WRITE_BATCH_SIZE,
+    SESSION_WRITE_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+SESSION_ID_PATTERN = re.compile(r"^session_[0-9a-f]{32}$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    turn_count INTEGER NOT NULL,
+    next_seq INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+"""
+
+
+def new_session_id() -> str:
+    """Return a new collision-free session identifier."""
+    return f"session_{uuid.uuid4().hex}"
+
+
+def is_valid_session_id(session_id: str) -> bool:
+    """Whether session_id has the format produced by new_session_id."""
+    return bool(SESSION_ID_PATTERN.match(session_id))
+
+
+class SessionStore:
+    """Append-only SQLite turn log with batched write-behind commits."""
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        batch_size: int = SESSION_WRITE_BATCH_SIZE,
+        flush_interval_ms: float = SESSION_FLUSH_INTERVAL_MS,
+        retries: int = SESSION_WRITE_RETRIES,
+        retention_seconds: float = SESSION_RETENTION_SECONDS,
+    ):
+        """
+        Initialize the store and start its writer thread.
+
+        Args:
+            path: SQLite database file (created if missing)
+            batch_size: Maximum queued writes committed in one transaction
+            flush_interval_ms: How long the writer waits to fill a batch
+            retries: Retries of a failed write before it is dropped
+            retention_seconds: Sessions not updated for this long are deleted
+                (0 keeps them forever)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_ms = flush_interval_ms
+        self.retries = retries
+        self.retention_seconds = retention_seconds
+        self.commits = 0
+        self.writes = 0
+        self.errors = 0
+        self.dropped = 0
+        self.purged = 0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._local = threading.local()
+        self._closed = False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Per-thread connection for reads."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def append(self, session_id: str, turns: List[Dict], turn_count: int):
+        """
+        Queue turns for writing; returns immediately.
+
+        Args:
+            session_id: Session the turns belong to
+            turns: Dicts with 'role' and 'content', in order
+            turn_count: Completed user->assistant turns after these turns
+        """
+        if self._closed:
+            logger.warning("Session store closed; dropping %d turns of %s", len(turns), session_id)
+            return
+        self._queue.put((session_id, [(t["role"], t["content"]) for t in turns], turn_count, time.time()))
+
+    def load(self, session_id: str, limit: int) -> Optional[Tuple[List[Dict], int]]:
+        """
+        Read the most recent turns of a session.
+
+        Turns still queued by this process are written first, waiting at
+        most SESSION_LOAD_FLUSH_SECONDS; after that the committed turns are
+        returned.
+
+        Args:
+            session_id: Session to read
+            limit: Maximum number of turns to return
+
+        Returns:
+            (turns oldest first, turn_count), or None for an unknown session
+        """
+        if not self.flush(SESSION_LOAD_FLUSH_SECONDS):
+            logger.warning("Session writes still pending; loading %s from committed turns only", session_id)
+        conn = self._reader()
+        row = conn.execute(
+            "SELECT turn_count FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        rows = conn.execute(
+            "SELECT role, content FROM turns WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, limit),
+        ).fetchall()
+        turns = [{"role": role, "content": content} for role, content in reversed(rows)]
+        return turns, row[0]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything queued so far is committed.
+
+        Returns:
+            False if the timeout expired first or the writer thread is not running
+        """
+        if self._closed:
+            return True
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush pending writes and stop the writer thread."""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """Return write-behind counters."""
+        return {
+            "path": self.path,
+            "pending": self._queue.qsize(),
+            "writes": self.writes,
+            "commits": self.commits,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "purged": self.purged,
+        }
+
+    def _run(self):
+        conn = self._connect()
+        # Transactions are managed explicitly (BEGIN IMMEDIATE)
+        conn.isolation_level = None
+        next_purge = time.monotonic()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval_ms / 1000
+            while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            writes = [item for item in batch if isinstance(item, tuple)]
+            try:
+                if writes:
+                    self._persist(conn, writes)
+                if self.retention_seconds > 0 and time.monotonic() >= next_purge:
+                    next_purge = time.monotonic() + SESSION_PURGE_INTERVAL_SECONDS
+                    self._purge(conn)
+            except Exception:
+                # Keep the writer alive; flush() callers would otherwise wait forever
+                logger.exception("Session writer failed on a batch of %d writes", len(writes))
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if batch[-1] is None:
+                conn.close()
+                return
+
+    def _persist(self, conn: sqlite3.Connection, writes: List[Tuple]):
+        """Commit writes, retrying failed ones with backoff before dropping them."""
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(0.05 * 2 ** (attempt - 1))
+            try:
+                failed = self._commit(conn, writes)
+            except sqlite3.Error as e:
+                # Nothing was committed, e.g. the database stayed locked
+                failed = [(write, e) for write in writes]
+            else:
+                self.commits += 1
+                self.writes += len(writes) - len(failed)
+            if not failed:
+                return
+            self.errors += 1
+            writes = [write for write, _ in failed]
+            error = failed[0][1]
+            logger.warning(
+                "Failed to persist %d session writes (attempt %d/%d): %s",
+                len(writes), attempt + 1, self.retries + 1, error,
+            )
+        self.dropped += len(writes)
+        logger.error("Dropped %d session writes after %d attempts: %s", len(writes), self.retries + 1, error)
+
+    def _purge(self, conn: sqlite3.Connection):
+        """Delete sessions that have not been updated within the retention period."""
+        cutoff = time.time() - self.retention_seconds
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "DELETE FROM turns WHERE session_id IN "
+                    "(SELECT session_id FROM sessions WHERE updated_at < ?)",
+                    (cutoff,),
+                )
+                purged = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning("Failed to purge expired sessions: %s", e)
+            return
+        if purged:
+            self.purged += purged
+            logger.info("Purged %d sessions idle for more than %.0f s", purged, self.retention_seconds)
+
+    def _commit(self, conn: sqlite3.Connection, writes: List[Tuple]) -> List[Tuple[Tuple, sqlite3.Error]]:
+        """
+        Apply writes in one transaction, each isolated in a savepoint.
+
+        Once a write of a session fails, the session's later writes in the
+        batch are skipped, so retrying keeps its turns in order.
+
+        Returns:
+            (write, error) pairs of the writes that were not applied
+
+        Raises:
+            sqlite3.Error: If the transaction itself failed; nothing was committed
+        """
+        failed = []
+        failed_sessions = set()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for write in writes:
+                if write[0] in failed_sessions:
+                    failed.append((write, error))
+                    continue
+                conn.execute("SAVEPOINT write")
+                try:
+                    self._write(conn, *write)
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO write")
+                    failed_sessions.add(write[0])
+                    failed.append((write, e))
+                    error = e
+                conn.execute("RELEASE write")
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return failed
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, session_id: str, turns: List[Tuple[str, str]],
+               turn_count: int, timestamp: float):
+        row = conn.execute(
+            "SELECT next_seq FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        seq = row[0] if row else 0
+        conn.executemany(
+            "INSERT INTO turns (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(session_id, seq + i, role, content, timestamp) for i, (role, content) in enumerate(turns)],
+        )
+        conn.execute(
+            "INSERT INTO sessions (session_id, turn_count, next_seq, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET "
+            "turn_count = excluded.turn_count, next_seq = excluded.next_seq, "
+            "updated_at = excluded.updated_at",
+            (session_id, turn_count, seq + len(turns), timestamp, timestamp),
+        )
+
+
+# Singleton instance
+_store_instance = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Get singleton session store instance."""
+    global _store_instance
+    if _store_instance is None:
+        with _store_lock:
+            if _store_instance is None:
+                _store_instance = SessionStore()
+    return _store_instance
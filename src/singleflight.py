@@ -0,0 +1,100 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+While a call for a key is in flight, further calls for the same key wait for
+it and share its result instead of doing the work again.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """An in-flight call and its eventual outcome."""
+
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key."""
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.executed = 0  # Calls that ran fn
+        self.coalesced = 0  # Calls that shared another call's result
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        timeout: Optional[float] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Run fn for key, or wait for an identical call already in flight.
+
+        Args:
+            key: Identity of the call
+            fn: Work to run if no call for key is in flight
+            timeout: Maximum seconds to wait for another call's result
+
+        Returns:
+            Tuple of (result, shared) where shared is True if the result
+            came from another caller's execution
+
+        Raises:
+            TimeoutError: If waiting for an in-flight call timed out
+            Exception: Whatever fn raised (re-raised in every waiter)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError("Timed out waiting for coalesced request")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.followers:
+                logger.debug("Shared one call with %d coalesced callers", call.followers)
+        return call.result, False
+
+    def stats(self) -> Dict:
+        """Return coalescing counters."""
+        with self._lock:
+            total = self.executed + self.coalesced
+            return {
+                "in_flight": len(self._calls),
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "coalesced_ratio": round(self.coalesced / total, 3) if total else 0.0,
+            }
@@ -0,0 +1,188 @@
+"""
+Startup and warm-up support.
+
+Loads the moderation model and preloads the Ollama model, recording how long
+each phase takes so worker start-up cost can be tracked, and keeps the Ollama
+model resident with periodic pings.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from .config import KEEP_WARM_HOURS, KEEP_WARM_INTERVAL_SECONDS
+from .model_provider import get_provider
+from .moderation import get_moderator
+
+logger = logging.getLogger(__name__)
+
+# Reference point for the startup report (first import of this module)
+_PROCESS_START = time.perf_counter()
+
+
+class StartupReport:
+    """Timings of the startup phases of a worker."""
+
+    def __init__(self):
+        """Initialize an empty report."""
+        self.phases: Dict[str, float] = {}  # phase name -> duration in ms
+        self.errors: Dict[str, str] = {}  # phase name -> error message
+        self.started = False
+        self.finished = False
+        self.ready_after_ms: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase and record any error it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                self.errors[name] = str(e)
+            logger.error(f"Startup phase '{name}' failed: {e}")
+        finally:
+            with self._lock:
+                self.phases[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    def mark_finished(self):
+        """Mark warm-up as complete."""
+        with self._lock:
+            self.finished = True
+            self.ready_after_ms = round((time.perf_counter() - _PROCESS_START) * 1000, 1)
+
+    def to_dict(self) -> Dict:
+        """Return the report as a JSON-serializable dictionary."""
+        with self._lock:
+            return {
+                "started": self.started,
+                "finished": self.finished,
+                "ready_after_ms": self.ready_after_ms,
+                "phases_ms": dict(self.phases),
+                "errors": dict(self.errors),
+            }
+
+
+def warm_up(report: Optional[StartupReport] = None) -> StartupReport:
+    """
+    Load and warm up the moderator and model provider.
+
+    Args:
+        report: Report to record timings into (a new one is created if None)
+
+    Returns:
+        The populated startup report
+    """
+    report = report or StartupReport()
+    report.started = True
+
+    with report.phase("moderator_load"):
+        get_moderator().load()
+    with report.phase("moderator_warm_up"):
+        get_moderator().warm_up()
+    with report.phase("model_preload"):
+        get_provider().warm_up()
+
+    report.mark_finished()
+    logger.info(f"Startup report: {report.to_dict()}")
+    return report
+
+
+# Singleton report for the current process
+_startup_report = StartupReport()
+
+
+def get_startup_report() -> StartupReport:
+    """Get the startup report for this process."""
+    return _startup_report
+
+
+def start_background_warm_up() -> threading.Thread:
+    """Run warm_up() in a daemon thread, recording into the process report."""
+    thread = threading.Thread(
+        target=warm_up,
+        args=(_startup_report,),
+        name="warm-up",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+class KeepWarm:
+    """Background thread that periodically preloads the model during business hours."""
+
+    def __init__(
+        self,
+        interval_seconds: float = KEEP_WARM_INTERVAL_SECONDS,
+        hours: Tuple[int, int] = KEEP_WARM_HOURS,
+    ):
+        """
+        Initialize the keep-warm pinger.
+
+        Args:
+            interval_seconds: Seconds between pings
+            hours: Local hours [start, end) during which to ping
+        """
+        self.interval_seconds = interval_seconds
+        self.hours = hours
+        self.last_ping_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def in_business_hours(self, now: Optional[datetime] = None) -> bool:
+        """Check whether the given (or current) local time is within keep-warm hours."""
+        hour = (now or datetime.now()).hour
+        start, end = self.hours
+        return start <= hour < end
+
+    def ping(self):
+        """Preload the model once, recording the outcome."""
+        try:
+            get_provider().preload()
+            self.last_ping_at = time.time()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning(f"Keep-warm ping failed: {e}")
+
+    def start(self):
+        """Start the background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="keep-warm", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            if self.in_business_hours():
+                self.ping()
+
+    def to_dict(self) -> Dict:
+        """Return keep-warm state as a JSON-serializable dictionary."""
+        return {
+            "running": self._thread is not None,
+            "in_business_hours": self.in_business_hours(),
+            "last_ping_at": self.last_ping_at,
+            "last_error": self.last_error,
+        }
+
+
+# Singleton keep-warm pinger
+_keep_warm = KeepWarm()
+
+
+def get_keep_warm() -> KeepWarm:
+    """Get the keep-warm pinger for this process."""
+    return _keep_warm